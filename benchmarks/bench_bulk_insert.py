@@ -0,0 +1,42 @@
+import argparse
+
+from database import db_manager
+from core.transactions import add_txn, add_txns_bulk
+from benchmarks.common import temp_db, seed_user, txn_rows, timed, report
+
+# --rows transactions through add_txn (one commit per row) against
+# add_txns_bulk (executemany, one commit per chunk), each into a fresh database
+
+
+def per_row(rows):
+    for r in rows:
+        add_txn(1, *r)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    rows = txn_rows(args.rows)
+
+    results = []
+    with temp_db():
+        seed_user(0)
+        seconds, _ = timed(per_row, rows)
+        count = db_manager.fetch_one("SELECT COUNT(*) FROM transactions")[0]
+        results.append(("add_txn per row", seconds, f"{count / seconds:9.0f} rows/s"))
+
+    with temp_db():
+        seed_user(0)
+        seconds, ids = timed(add_txns_bulk, 1, rows, args.chunk_size)
+        assert len(ids) == args.rows
+        results.append((f"add_txns_bulk (chunks of {args.chunk_size})", seconds,
+                        f"{len(ids) / seconds:9.0f} rows/s"))
+
+    report(f"inserting {args.rows} transactions", results)
+    print(f"  speedup {results[0][1] / results[1][1]:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import resource
+import tempfile
+
+from fpdf import FPDF
+
+from core.report import write_pdf_report
+from core.transactions import iter_txns
+from benchmarks.common import temp_db, seed_user, timed, report
+
+# write_pdf_report on --rows transactions. --legacy also times the export it
+# replaced (one flowing cell per transaction, fpdf's own output buffer), which
+# goes quadratic on long histories
+
+
+def legacy_pdf(user_id, path):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Transaction History", ln=True, align="C")
+    pdf.ln(10)
+    for t in iter_txns(user_id):
+        line = f"{t['date']} | {t['transaction_type']} | {t['amount']} | {t['category_name']} | {t['bank_name']} | {t['description'] or ''}"
+        pdf.cell(200, 8, txt=line, ln=True)
+    pdf.output(path)
+    return pdf.page_no()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--legacy", action="store_true", help="also time the old line-per-cell export")
+    args = parser.parse_args()
+
+    results = []
+    with temp_db(), tempfile.TemporaryDirectory() as out:
+        seed_user(args.rows)
+
+        path = os.path.join(out, "report.pdf")
+        seconds, (ok, msg) = timed(write_pdf_report, 1, path)
+        assert ok, msg
+        results.append(("write_pdf_report", seconds,
+                        f"{args.rows / seconds:7.0f} rows/s  {msg}, {os.path.getsize(path) / 1e6:.1f} MB"))
+
+        if args.legacy:
+            path = os.path.join(out, "legacy.pdf")
+            seconds, pages = timed(legacy_pdf, 1, path)
+            results.append(("line-per-cell (old)", seconds,
+                            f"{args.rows / seconds:7.0f} rows/s  {pages} pages, {os.path.getsize(path) / 1e6:.1f} MB"))
+
+    report(f"pdf export of {args.rows} transactions", results)
+    # linux reports KiB
+    print(f"  peak rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import sqlite3
+import threading
+
+from database import db_manager
+from benchmarks.common import temp_db, seed_user, timed, report
+
+# open-per-query (what db_manager did before the pool) against the pooled
+# per-thread connection, on a database with --rows transactions
+
+QUERIES = {
+    # tiny lookup, is_dark_mode runs this several times per dashboard build
+    "settings lookup": ("SELECT dark_mode, currency FROM settings WHERE user_id = ?", (1,)),
+    # a real read, dominated by the query itself
+    "recent activity": ("SELECT * FROM transactions WHERE user_id = ? ORDER BY date DESC LIMIT 5", (1,)),
+}
+
+
+def fetch_all_unpooled(query, params=()):
+    conn = sqlite3.connect(db_manager.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run(fetch, query, params, calls):
+    for _ in range(calls):
+        fetch(query, params)
+
+
+def run_threads(fetch, query, params, calls, threads):
+    def work():
+        run(fetch, query, params, calls)
+        db_manager.close_thread_connection()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with temp_db():
+        seed_user(args.rows)
+        for name, (query, params) in QUERIES.items():
+            db_manager.fetch_all(query, params)  # warm the page cache for both sides
+            rows = []
+            for label, fetch in (("open-per-query", fetch_all_unpooled), ("pooled", db_manager.fetch_all)):
+                seconds, _ = timed(run, fetch, query, params, args.calls)
+                rows.append((label, seconds, f"{seconds / args.calls * 1e6:7.1f} us/query"))
+                seconds, _ = timed(run_threads, fetch, query, params, args.calls, args.threads)
+                rows.append((f"{label}, {args.threads} threads", seconds,
+                             f"{seconds / (args.calls * args.threads) * 1e6:7.1f} us/query"))
+            report(f"{name}, {args.calls} calls, {args.rows} transactions", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+from database import db_manager
+from core import ai_suggestions, http_client
+from core.ai_suggestions import BudgetFinding, Findings, generate_suggestions
+from benchmarks.common import temp_db, seed_user, timed, report
+from benchmarks.stub_llm_server import StubLLMServer
+
+# generate_suggestions against the local stub llm: one batched request for every
+# finding, against one request per finding (in parallel, then one at a time).
+# every run starts with an empty response cache
+
+
+def findings(count):
+    over = [BudgetFinding(f"category {i}", 100.0, 140.0 + i) for i in range(count // 2)]
+    near = [BudgetFinding(f"category {i}", 100.0, 85.0) for i in range(count // 2, count - 1)]
+    return Findings(over_budget=over, near_budget=near, top_recurring="Subscriptions")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--findings", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per request")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("batched", {"batched": True}),
+        ("per finding, parallel", {"batched": False}),
+        ("per finding, sequential", {"batched": False, "max_workers": 1}),
+    ]
+    results = []
+    with temp_db(), StubLLMServer(latency=args.latency) as server:
+        seed_user(0)
+        ai_suggestions.GROQ_API_URL = server.url
+        ai_suggestions.GROQ_API_KEY = "stub"
+        groq = http_client.PROVIDERS["groq"]
+
+        for label, kwargs in scenarios:
+            db_manager.execute_query("DELETE FROM llm_cache")
+            # let the groq token bucket refill so every scenario starts from a full burst
+            time.sleep(groq["burst"] / groq["rate"])
+            before = server.requests
+            seconds, tips = timed(generate_suggestions, 1, findings=findings(args.findings), **kwargs)
+            assert len(tips) == args.findings and not any(t.startswith("⚠️") for t in tips), tips
+            results.append((label, seconds, f"round trips: {server.requests - before}"))
+
+    report(f"{args.findings} findings, {args.latency * 1000:.0f} ms per request "
+           f"(groq limit {groq['rate']}/s, burst {groq['burst']})", results)
+
+
+if __name__ == "__main__":
+    main()
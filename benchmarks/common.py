@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from database import db_manager
+
+# shared setup for the scripts in this folder. run them from the repo root:
+#   python -m benchmarks.<name> [--rows N]
+
+
+@contextlib.contextmanager
+def temp_db():
+    # a fresh, migrated database in a temp dir, deleted afterwards
+    tmp = tempfile.mkdtemp(prefix="pennywise-bench-")
+    old = db_manager.DB_PATH
+    db_manager.close_all_connections()
+    db_manager.DB_PATH = os.path.join(tmp, "pennywise.db")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager.initialize_db()
+        yield db_manager.DB_PATH
+    finally:
+        db_manager.close_all_connections()
+        db_manager.DB_PATH = old
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def txn_rows(n, seed=1):
+    # add_txn order: (acc_id, cat_id, amount, type, note, date, recurring)
+    rng = random.Random(seed)
+    return [(
+        rng.choice(["acc_salary", "acc_savings"]),
+        rng.randint(1, 10),
+        round(rng.uniform(1, 500), 2),
+        rng.choice(["income", "expense", "expense"]),
+        rng.choice(["Coffee Shop", "Grocery Store", "Uber", "Netflix", "Payroll"]),
+        f"{rng.randint(2022, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        0
+    ) for _ in range(n)]
+
+
+def seed_user(rows, user_id=1):
+    # user 1 with settings, 10 budgeted categories, two accounts and `rows` transactions
+    from core.transactions import add_txns_bulk
+    db_manager.execute_query(
+        "INSERT INTO users (user_id, email, username, password_hash, role) VALUES (?, ?, ?, 'x', 'End User')",
+        (user_id, f"bench{user_id}@example.com", f"bench{user_id}"))
+    db_manager.execute_query("INSERT INTO settings (user_id, currency) VALUES (?, 'USD')", (user_id,))
+    db_manager.execute_many(
+        "INSERT INTO categories (user_id, category_name, budget_amount) VALUES (?, ?, 250)",
+        [(user_id, f"category {i}") for i in range(10)])
+    db_manager.execute_query("""
+        INSERT INTO accounts (user_id, account_id, account_type, bank_name, currency)
+        VALUES (?, 'acc_salary', 'salary', 'Bank', 'USD'), (?, 'acc_savings', 'savings', 'Bank', 'USD')
+    """, (user_id, user_id))
+    if rows:
+        add_txns_bulk(user_id, txn_rows(rows))
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def report(title, rows):
+    # rows are (label, seconds, note)
+    print(title)
+    for label, seconds, note in rows:
+        print(f"  {label:<34} {seconds * 1000:10.1f} ms  {note}")
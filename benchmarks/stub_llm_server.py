@@ -0,0 +1,73 @@
+import argparse
+import logging
+import re
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+# a local stand-in for the groq chat completions endpoint, with a fixed delay per
+# request so round trips show up in timings. batch prompts (numbered issues) get a
+# json array back, single prompts one tip. to point the app at it:
+#   python -m benchmarks.stub_llm_server --port 8766
+#   GROQ_API_URL=http://127.0.0.1:8766/openai/v1/chat/completions python main.py
+
+
+def create_app(latency=0.3):
+    app = Flask("stub_llm")
+    app.config.update(latency=latency, requests=0)
+    lock = threading.Lock()
+
+    @app.post("/openai/v1/chat/completions")
+    def completions():
+        body = request.get_json(force=True)
+        with lock:
+            app.config["requests"] += 1
+        time.sleep(app.config["latency"])
+
+        prompt = body["messages"][-1]["content"]
+        issues = re.findall(r"^\d+\. ", prompt, re.MULTILINE)
+        if issues:
+            tips = [f'"Tip {i}: move a fixed amount to savings on payday."' for i in range(1, len(issues) + 1)]
+            content = "Here are your tips:\n[" + ", ".join(tips) + "]"
+        else:
+            content = "Move a fixed amount to savings on payday."
+        return jsonify({
+            "id": "stub",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        })
+
+    return app
+
+
+class StubLLMServer:
+    # create_app() served on a background thread, `with StubLLMServer() as server: server.url`
+    def __init__(self, port=0, **kwargs):
+        self.app = create_app(**kwargs)
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self.server = make_server("127.0.0.1", port, self.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/openai/v1/chat/completions"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.app.config["requests"]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per request")
+    args = parser.parse_args()
+    create_app(args.latency).run(port=args.port)
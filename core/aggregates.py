@@ -0,0 +1,70 @@
+from database.db_manager import fetch_all, execute_query, transaction
+
+# category_spend / account_balance are kept current by triggers on transactions
+# (migration 10). these rebuild them from scratch and check them against the raw rows,
+# from the command line: python -m pennywise aggregates verify|rebuild
+
+# totals drift by float rounding after many updates, anything past this is a real mismatch
+TOLERANCE = 0.005
+
+CATEGORY_SPEND_SQL = """
+    SELECT user_id, IFNULL(category_id, 0) AS category_id, transaction_type,
+           IFNULL(strftime('%Y-%m', date), '') AS period,
+           SUM(amount) AS total, COUNT(*) AS txn_count
+    FROM transactions
+    {where}
+    GROUP BY 1, 2, 3, 4
+"""
+
+ACCOUNT_BALANCE_SQL = """
+    SELECT user_id, IFNULL(account_id, '') AS account_id,
+           SUM(CASE WHEN transaction_type = 'income' THEN amount ELSE -amount END) AS balance,
+           COUNT(*) AS txn_count
+    FROM transactions
+    {where}
+    GROUP BY 1, 2
+"""
+
+
+def _scope(user_id):
+    return ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+
+
+def rebuild_aggregates(user_id=None):
+    # everyone, or just one user. runs in one transaction so readers never see it half done
+    where, params = _scope(user_id)
+    with transaction():
+        execute_query(f"DELETE FROM category_spend {where}", params)
+        execute_query(f"DELETE FROM account_balance {where}", params)
+        execute_query(f"""
+            INSERT INTO category_spend (user_id, category_id, transaction_type, period, total, txn_count)
+            {CATEGORY_SPEND_SQL.format(where=where)}
+        """, params)
+        execute_query(f"""
+            INSERT INTO account_balance (user_id, account_id, balance, txn_count)
+            {ACCOUNT_BALANCE_SQL.format(where=where)}
+        """, params)
+
+
+def verify_aggregates(user_id=None):
+    # returns a list of (table, key, stored, actual) for every row that disagrees
+    where, params = _scope(user_id)
+    problems = []
+
+    checks = [
+        ("category_spend", CATEGORY_SPEND_SQL, ("user_id", "category_id", "transaction_type", "period"), "total"),
+        ("account_balance", ACCOUNT_BALANCE_SQL, ("user_id", "account_id"), "balance"),
+    ]
+    for table, sql, keys, value in checks:
+        actual = {tuple(r[k] for k in keys): (r[value], r["txn_count"])
+                  for r in fetch_all(sql.format(where=where), params)}
+        stored = {tuple(r[k] for k in keys): (r[value], r["txn_count"])
+                  for r in fetch_all(f"SELECT * FROM {table} {where}", params)}
+        for key in actual.keys() | stored.keys():
+            have = stored.get(key, (0, 0))
+            want = actual.get(key, (0, 0))
+            if abs(have[0] - want[0]) > TOLERANCE or have[1] != want[1]:
+                problems.append((table, key, have, want))
+
+    return problems
+
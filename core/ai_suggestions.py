@@ -1,12 +1,109 @@
-from database.db_manager import fetch_all, fetch_one, execute_query
+from database.db_manager import fetch_all, fetch_one, execute_query, close_thread_connection
+from core.llm_cache import cache_key, get_cached, put_cached
+from core import http_client
+from core.budget import get_budget_status
+from core.commitment_manager import notification_hash
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
 import requests
+import json
 import os
+import re
+import traceback
 
 # Set this as an env var or paste your key directly
 GROQ_API_KEY = os.getenv("GROQ_API_KEY") or "."
+# GROQ_API_URL can point at a local stub server for testing
+GROQ_API_URL = os.getenv("GROQ_API_URL") or "https://api.groq.com/openai/v1/chat/completions"
+
+# how many tip requests may be in flight at once
+SUGGESTION_WORKERS = int(os.getenv("PENNYWISE_TIP_WORKERS") or 3)
+
+TIP_MODEL = "llama3-70b-8192"
+TIP_SYSTEM_PROMPT = "You are a top-tier financial advisor. Be brief, impactful, and specific."
+TIP_TEMPERATURE = 0.7
+
+# ask for every finding's tip in one request, falling back to one request per
+# finding only when the reply can't be parsed
+BATCH_TIPS = True
+BATCH_SYSTEM_PROMPT = (
+    TIP_SYSTEM_PROMPT + " Reply with a JSON array of strings only, one tip per numbered issue, in order."
+)
 
 
 def generate_openai_tip(summary):
+    # near identical summaries reuse an earlier answer instead of another api call
+    key = cache_key(TIP_MODEL, TIP_SYSTEM_PROMPT, summary, TIP_TEMPERATURE)
+    cached = get_cached(key)
+    if cached:
+        return cached
+
+    tip = request_openai_tip(summary)
+    if not tip.startswith("⚠️"):
+        put_cached(key, tip)
+    return tip
+
+
+def generate_tips_batch(summaries):
+    # one request for all findings. returns one tip per summary, or None when the
+    # reply isn't a usable json array so the caller can fall back
+    key = cache_key(TIP_MODEL, BATCH_SYSTEM_PROMPT, "\n".join(summaries), TIP_TEMPERATURE)
+    cached = get_cached(key)
+    if cached:
+        return json.loads(cached)
+
+    issues = "\n".join(f"{i}. {s}" for i, s in enumerate(summaries, 1))
+    reply = request_chat(
+        BATCH_SYSTEM_PROMPT,
+        f"User issues:\n{issues}\n\nFor each issue give **1 short financial tip** (1-2 sentences max). "
+        f"Make the intro sentence strong, avoid fluff. Return exactly {len(summaries)} tips as a JSON array.",
+        max_tokens=100 * len(summaries)
+    )
+    if reply.startswith("⚠️"):
+        # api trouble, not a parse problem: per-finding calls would fail the same way
+        return [reply] * len(summaries)
+
+    tips = parse_tip_list(reply, len(summaries))
+    if tips:
+        put_cached(key, json.dumps(tips))
+    return tips
+
+
+def parse_tip_list(text, expected):
+    # models wrap json in code fences, add a sentence before it, or return objects
+    # instead of strings. take the outermost [...] and accept either form
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            items = json.loads(text[start:end + 1])
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            tips = []
+            for item in items:
+                if isinstance(item, dict):
+                    item = item.get("tip") or item.get("text") or item.get("content")
+                if isinstance(item, str) and item.strip():
+                    tips.append(item.strip())
+            if len(tips) >= expected:
+                return tips[:expected]
+
+    # last resort: a plain numbered list
+    lines = re.findall(r"^\s*\d+[.)]\s+(.+)$", text, re.MULTILINE)
+    if len(lines) >= expected:
+        return [l.strip() for l in lines[:expected]]
+    return None
+
+
+def request_openai_tip(summary):
+    return request_chat(
+        TIP_SYSTEM_PROMPT,
+        f"User issue:\n{summary}\n\nGive **1 short financial tip** (1-2 sentences max). Make the intro sentence strong, avoid fluff."
+    )
+
+
+def request_chat(system_prompt, user_content, max_tokens=100):
     try:
         if not GROQ_API_KEY:
             return "⚠️ API key not configured"
@@ -17,23 +114,24 @@ def generate_openai_tip(summary):
         }
 
         data = {
-            "model": "llama3-70b-8192",
+            "model": TIP_MODEL,
             "messages": [
                 {
                     "role": "system",
-                    "content": "You are a top-tier financial advisor. Be brief, impactful, and specific."
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
-                    "content": f"User issue:\n{summary}\n\nGive **1 short financial tip** (1-2 sentences max). Make the intro sentence strong, avoid fluff."
+                    "content": user_content
                 }
             ],
-            "temperature": 0.7,
-            "max_tokens": 100
+            "temperature": TIP_TEMPERATURE,
+            "max_tokens": max_tokens
         }
 
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = http_client.post(
+            "groq",
+            GROQ_API_URL,
             headers=headers,
             json=data,
             timeout=10
@@ -78,90 +176,169 @@ def get_recent_suggestions(user_id):
         return []
 
 
-def generate_suggestions(user_id):
-    tips = []
+@dataclass
+class BudgetFinding:
+    category: str
+    budget: float
+    used: float
+
+    @property
+    def over(self):
+        return self.used - self.budget
+
+    @property
+    def percent(self):
+        return (self.used / self.budget) * 100 if self.budget else 0.0
+
+
+@dataclass
+class Findings:
+    over_budget: list = field(default_factory=list)   # BudgetFinding, used > budget
+    near_budget: list = field(default_factory=list)   # BudgetFinding, used > 80% of budget
+    top_recurring: Optional[str] = None               # category with the most recurring txns
+    income: float = 0.0
+    expense: float = 0.0
+
+    @property
+    def overspending(self):
+        return self.income < self.expense
+
+    def items(self):
+        # (severity, prompt summary, local tip) per finding, most severe first. the
+        # prompt, llm tips, fallback and saved tips all follow this order, so the llm
+        # text replaces the local tip about the same finding
+        out = []
+        for b in self.over_budget:
+            out.append((
+                3 + min(b.over / b.budget, 1.0),
+                f"The user set a ₺{b.budget:.2f} budget for {b.category} but has already spent ₺{b.used:.2f}, "
+                f"exceeding it by ₺{b.over:.2f}. Income is currently less than expenses.",
+                f"You're ₺{b.over:.2f} over your {b.category} budget. Hold off on any non-essential "
+                f"{b.category} spending until the next period and check what pushed it over."
+            ))
+        for b in self.near_budget:
+            out.append((
+                1 + b.percent / 100,
+                f"Spending in {b.category} is at ₺{b.used:.2f} out of a ₺{b.budget:.2f} budget "
+                f"({b.percent:.0f}% used). Suggest a way to cut back before reaching the limit.",
+                f"{b.category} is at {b.percent:.0f}% of its budget with ₺{b.budget - b.used:.2f} left. "
+                f"Plan the remaining purchases now so you don't go over."
+            ))
+        if self.top_recurring:
+            out.append((
+                1.0,
+                f"The user has frequent recurring transactions in the {self.top_recurring} category. "
+                "Some of these may not be essential.",
+                f"Most of your recurring payments are in {self.top_recurring}. Review them and cancel "
+                "any subscription you no longer use."
+            ))
+        if self.overspending:
+            gap = self.expense - self.income
+            out.append((
+                3.5,
+                f"The user's total income is ₺{self.income:.2f} while total expenses are ₺{self.expense:.2f}. "
+                "They are spending more than they earn this month.",
+                f"You're spending ₺{gap:.2f} more than you earn. Cut your largest flexible category first "
+                "and set a budget for it."
+            ))
+        return sorted(out, key=lambda i: i[0], reverse=True)
 
-    # check budget usage
+    def summaries(self):
+        return [summary for _, summary, _ in self.items()]
+
+    def local_tips(self):
+        # rule based tips lined up with summaries(), used when the llm gives nothing usable
+        return [tip for _, _, tip in self.items()]
+
+
+def rank_local_tips(findings):
+    # deterministic, no network: most severe first. shown until llm tips arrive
+    return findings.local_tips()
+
+
+def collect_findings(user_id):
+    # one grouped pass over the user's transactions gives recurring counts and
+    # income/expense totals together. budget usage is for the current period
     q = '''
-    select c.category_name, c.budget_amount,
-    (select sum(t.amount) from transactions t
-     where t.user_id = ? and t.category_id = c.category_id
-     and t.transaction_type = 'expense') as used
-    from categories c
-    where c.user_id = ? and c.budget_amount > 0
-    '''
-    rows = fetch_all(q, (user_id, user_id))
-    for r in rows:
-        used = r["used"] or 0
-        budget = r["budget_amount"]
-        category = r["category_name"]
-
-        if used > budget:
-            over = used - budget
-            summary = (
-                f"The user set a ₺{budget:.2f} budget for {category} but has already spent ₺{used:.2f}, "
-                f"exceeding it by ₺{over:.2f}. Income is currently less than expenses."
-            )
-            tip = generate_openai_tip(summary)
-            tips.append(tip)
-        elif used > 0.8 * budget:
-            percent = (used / budget) * 100
-            summary = (
-                f"Spending in {category} is at ₺{used:.2f} out of a ₺{budget:.2f} budget "
-                f"({percent:.0f}% used). Suggest a way to cut back before reaching the limit."
-            )
-            tip = generate_openai_tip(summary)
-            tips.append(tip)
-
-    # most common recurring transaction
-    q2 = '''
-    select c.category_name, count(*) as freq
+    select t.category_id, c.category_name,
+        sum(case when t.transaction_type = 'expense' then t.amount else 0 end) as spent,
+        sum(case when t.transaction_type = 'income' then t.amount else 0 end) as earned,
+        sum(case when t.is_recurring = 1 then 1 else 0 end) as recurring
     from transactions t
-    join categories c on t.category_id = c.category_id
-    where t.user_id = ? and t.is_recurring = 1
+    left join categories c on t.category_id = c.category_id
+    where t.user_id = ?
     group by t.category_id
-    order by freq desc limit 1
     '''
-    top = fetch_one(q2, (user_id,))
-    if top:
-        summary = (
-            f"The user has frequent recurring transactions in the {top['category_name']} category. "
-            "Some of these may not be essential."
-        )
-        tip = generate_openai_tip(summary)
-        tips.append(tip)
-
-    # income vs expense check
-    q3 = '''
-    select transaction_type, sum(amount) as total
-    from transactions
-    where user_id = ?
-    group by transaction_type
-    '''
-    stats = fetch_all(q3, (user_id,))
-    totals = {r["transaction_type"]: r["total"] for r in stats}
-    inc = totals.get("income", 0)
-    exp = totals.get("expense", 0)
-    if inc < exp:
-        summary = (
-            f"The user's total income is ₺{inc:.2f} while total expenses are ₺{exp:.2f}. "
-            "They are spending more than they earn this month."
-        )
-        tip = generate_openai_tip(summary)
-        tips.append(tip)
+    findings = Findings()
+    top_count = 0
+
+    for r in fetch_all(q, (user_id,)):
+        findings.income += r["earned"] or 0
+        findings.expense += r["spent"] or 0
+
+        if r["category_name"] is None:
+            continue
+        if r["recurring"] > top_count:
+            top_count = r["recurring"]
+            findings.top_recurring = r["category_name"]
 
-    # save to db
-    saved = 0
+    for b in get_budget_status(user_id):
+        budget, spent = b["available"], b["spent"]
+        if b["budget_amount"] <= 0 or budget <= 0:
+            continue
+        if spent > budget:
+            findings.over_budget.append(BudgetFinding(b["category_name"], budget, spent))
+        elif spent > 0.8 * budget:
+            findings.near_budget.append(BudgetFinding(b["category_name"], budget, spent))
+
+    return findings
+
+
+def generate_suggestions(user_id, max_workers=None, batched=None, findings=None):
+    # pass the findings the caller already has to skip collecting them again
+    if findings is None:
+        findings = collect_findings(user_id)
+    summaries = findings.summaries()
+
+    tips = []
+    if summaries and (BATCH_TIPS if batched is None else batched):
+        tips = generate_tips_batch(summaries) or []
+
+    # one request per finding, in parallel instead of one after another
+    if summaries and not tips:
+        workers = max(1, min(max_workers or SUGGESTION_WORKERS, len(summaries)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            tips = list(pool.map(_tip_worker, summaries))
+
+    # save to db, llm text only (the local tips are rebuilt from the findings every time)
     for t in tips[:2]:  # get only first 2
-        if "⚠️ AI error" not in t and "more than your income" not in t.lower():
+        if not t.startswith("⚠️") and "more than your income" not in t.lower():
             insert_tip(user_id,t)
 
-    return tips
+    # api down, rate limited or no key: use the local tip for that finding instead of a warning
+    fallback = findings.local_tips()
+    return [fallback[i] if t.startswith("⚠️") and i < len(fallback) else t for i, t in enumerate(tips)]
+
+
+def _tip_worker(summary):
+    # pool threads touch the db through the response cache, release their connection
+    try:
+        return generate_openai_tip(summary)
+    finally:
+        close_thread_connection()
 
 
 def insert_tip(user_id, content):
+    # a cached answer comes back word for word on every login, so keep one copy per
+    # user. the hash lookup rides the (user_id, content_hash, notify_day) index.
+    # returns whether it was new
+    content_hash = notification_hash(content)
     q = '''
-    insert into ai_suggestions (user_id, content, is_read)
-    values (?, ?, 0)
+    insert into ai_suggestions (user_id, content, content_hash, is_read)
+    select ?, ?, ?, 0
+    where not exists (
+        select 1 from ai_suggestions where user_id = ? and content_hash = ?
+    )
     '''
-    execute_query(q, (user_id, content), commit=True)
+    cur = execute_query(q, (user_id, content, content_hash, user_id, content_hash), commit=True)
+    return cur.rowcount > 0
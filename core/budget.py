@@ -1,12 +1,24 @@
+from datetime import date, datetime, timedelta
 from database.db_manager import fetch_one, fetch_all, execute_query
 
-def set_budget(user_id, cat_id, amount):
-    # update or set budget amount for a category
+BUDGET_PERIODS = ("monthly", "weekly")
+# none = every period starts fresh, unused = leftover budget carries into the next
+# period, all = leftovers and overspending both carry. only the previous period counts
+ROLLOVER_MODES = ("none", "unused", "all")
+
+def set_budget(user_id, cat_id, amount, period=None, rollover=None):
+    # update or set budget amount for a category, optionally its period and rollover
+    if period is not None and period not in BUDGET_PERIODS:
+        raise ValueError(f"unknown budget period: {period}")
+    if rollover is not None and rollover not in ROLLOVER_MODES:
+        raise ValueError(f"unknown rollover mode: {rollover}")
     q = '''
-    update categories set budget_amount = ?
+    update categories set budget_amount = ?,
+        budget_period = coalesce(?, budget_period),
+        budget_rollover = coalesce(?, budget_rollover)
     where user_id = ? and category_id = ?
     '''
-    execute_query(q, (amount, user_id, cat_id), commit=True)
+    execute_query(q, (amount, period, rollover, user_id, cat_id), commit=True)
 
 def get_budget(user_id, cat_id):
     # get the budget limit for a category
@@ -17,23 +29,96 @@ def get_budget(user_id, cat_id):
     row = fetch_one(q, (user_id, cat_id))
     return row["budget_amount"] if row else 0
 
-def get_spent(user_id, cat_id):
-    # get how much the user already spent in a category
-    q = '''
-    select sum(amount) as total_spent from transactions
-    where user_id = ? and category_id = ? and transaction_type = 'expense'
-    '''
-    row = fetch_one(q, (user_id, cat_id))
-    return row["total_spent"] if row and row["total_spent"] else 0
+def period_bounds(period, on=None):
+    # [start, end) of the period containing `on`, as dates. weeks start on monday
+    on = on or date.today()
+    if isinstance(on, datetime):
+        on = on.date()
+    if period == "weekly":
+        start = on - timedelta(days=on.weekday())
+        return start, start + timedelta(days=7)
+    start = on.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+def previous_bounds(period, on=None):
+    start, _ = period_bounds(period, on)
+    return period_bounds(period, start - timedelta(days=1))
+
+def get_budget_status(user_id, on=None):
+    # every category's budget for the period containing `on` (default today), in one query.
+    # spend is a range scan on idx_transactions_spend over the current and previous
+    # month/week only, never the whole history. dates compare as text, so the bounds
+    # also catch 'YYYY-MM-DD HH:MM:SS' rows
+    m0, m1 = period_bounds("monthly", on)
+    pm0, _ = previous_bounds("monthly", on)
+    w0, w1 = period_bounds("weekly", on)
+    pw0, _ = previous_bounds("weekly", on)
+    lo, hi = min(pm0, pw0), max(m1, w1)
 
-def get_all_budgets(user_id):
-    # return all categories with budget and how much was used
     q = '''
-    select c.category_id, c.category_name, c.budget_amount,
-    (select sum(t.amount)
-     from transactions t
-     where t.category_id = c.category_id and t.user_id = ? and t.transaction_type = 'expense') as used
+    select c.category_id, c.category_name, c.color, c.budget_amount,
+        coalesce(c.budget_period, 'monthly') as budget_period,
+        coalesce(c.budget_rollover, 'none') as budget_rollover,
+        s.month_spent, s.prev_month_spent, s.week_spent, s.prev_week_spent
     from categories c
+    left join (
+        select category_id,
+            sum(case when date >= ? and date < ? then amount end) as month_spent,
+            sum(case when date >= ? and date < ? then amount end) as prev_month_spent,
+            sum(case when date >= ? and date < ? then amount end) as week_spent,
+            sum(case when date >= ? and date < ? then amount end) as prev_week_spent
+        from transactions
+        where user_id = ? and transaction_type = 'expense' and date >= ? and date < ?
+        group by category_id
+    ) s on s.category_id = c.category_id
     where c.user_id = ?
     '''
-    return fetch_all(q, (user_id, user_id))
+    bounds = [str(d) for d in (m0, m1, pm0, m0, w0, w1, pw0, w0)]
+    rows = fetch_all(q, (*bounds, user_id, str(lo), str(hi), user_id))
+
+    status = []
+    for r in rows:
+        weekly = r["budget_period"] == "weekly"
+        spent = (r["week_spent"] if weekly else r["month_spent"]) or 0
+        prev_spent = (r["prev_week_spent"] if weekly else r["prev_month_spent"]) or 0
+        budget = r["budget_amount"] or 0
+
+        carried = 0
+        if budget > 0 and r["budget_rollover"] == "unused":
+            carried = max(budget - prev_spent, 0)
+        elif budget > 0 and r["budget_rollover"] == "all":
+            carried = budget - prev_spent
+
+        available = budget + carried
+        start, end = (w0, w1) if weekly else (m0, m1)
+        status.append({
+            "category_id": r["category_id"],
+            "category_name": r["category_name"],
+            "color": r["color"],
+            "budget_amount": budget,
+            "budget_period": r["budget_period"],
+            "budget_rollover": r["budget_rollover"],
+            "period_start": str(start),
+            "period_end": str(end),
+            "spent": spent,
+            "carried": carried,
+            "available": available,
+            "remaining": available - spent,
+            "percent": (spent / available) * 100 if available > 0 else (100.0 if spent > 0 else 0.0),
+        })
+    return status
+
+def get_spent(user_id, cat_id, on=None):
+    # get how much the user already spent in a category this period
+    for s in get_budget_status(user_id, on):
+        if s["category_id"] == cat_id:
+            return s["spent"]
+    return 0
+
+def get_all_budgets(user_id, on=None):
+    # return all categories with budget and how much was used this period
+    return [
+        {"category_id": s["category_id"], "category_name": s["category_name"],
+         "budget_amount": s["budget_amount"], "used": s["spent"]}
+        for s in get_budget_status(user_id, on)
+    ]
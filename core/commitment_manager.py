@@ -1,36 +1,36 @@
-from datetime import datetime
-from database.db_manager import fetch_all, fetch_one, execute_query
+from datetime import datetime, date
+from database.db_manager import fetch_all, execute_query, execute_many
+import hashlib
 
-def check_commitments(user_id):
-    setting = fetch_one("SELECT notifications_enabled FROM settings WHERE user_id = ?", (user_id,))
-    if not setting or setting["notifications_enabled"] == 0:
-        return  # Global toggle is OFF
+# how many days ahead an unpaid commitment starts showing reminders
+REMINDER_DAYS = 7
 
-    today = datetime.now()
-    today_day = today.day
+def check_commitments(user_id):
+    today_day = datetime.now().day
 
+    # one pass: the settings join drops everyone with notifications off (global toggle),
+    # and only unpaid commitments inside the reminder window come back, already classified
     commitments = fetch_all("""
-        SELECT cc.*, c.category_name
+        SELECT c.category_name, cc.amount, cc.due_day - ? AS days_until,
+               CASE WHEN cc.due_day < ? THEN 'overdue'
+                    WHEN cc.due_day = ? THEN 'today'
+                    ELSE 'upcoming' END AS status
         FROM category_commitments cc
         JOIN categories c ON cc.category_id = c.category_id
-        WHERE cc.user_id = ?
-    """, (user_id,))
+        JOIN settings s ON s.user_id = cc.user_id AND COALESCE(s.notifications_enabled, 1) != 0
+        WHERE cc.user_id = ? AND cc.is_paid = 0 AND cc.due_day <= ?
+    """, (today_day, today_day, today_day, user_id, today_day + REMINDER_DAYS))
 
+    messages = []
     for c in commitments:
-        due_day = c["due_day"]
-        days_until = due_day - today_day
-
-        if due_day < today_day and not c["is_paid"]:
-            msg = f"⚠️ '{c['category_name']}' commitment overdue! Pay {c['amount']}"
-        elif due_day == today_day and not c["is_paid"]:
-            msg = f"📅 '{c['category_name']}' is due today: {c['amount']}"
-        elif 0 < days_until <= 7 and not c["is_paid"]:
-            msg = f"🔔 Reminder: '{c['category_name']}' due in {days_until} days"
+        if c["status"] == "overdue":
+            messages.append(f"⚠️ '{c['category_name']}' commitment overdue! Pay {c['amount']}")
+        elif c["status"] == "today":
+            messages.append(f"📅 '{c['category_name']}' is due today: {c['amount']}")
         else:
-            continue
+            messages.append(f"🔔 Reminder: '{c['category_name']}' due in {c['days_until']} days")
 
-        if not already_notified(user_id, msg):
-            add_notification(user_id, msg)
+    return add_notifications(user_id, messages)
 
 def mark_commitment_paid(commitment_id):
     execute_query("""
@@ -38,8 +38,11 @@ def mark_commitment_paid(commitment_id):
         WHERE commitment_id = ?
     """, (commitment_id,))
 
-def reset_commitments_monthly():
-    execute_query("UPDATE category_commitments SET is_paid = 0 WHERE 1=1")
+def reset_commitments_monthly(user_id=None):
+    if user_id is None:
+        execute_query("UPDATE category_commitments SET is_paid = 0 WHERE 1=1")
+    else:
+        execute_query("UPDATE category_commitments SET is_paid = 0 WHERE user_id = ?", (user_id,))
 
 def add_notification(user_id, content):
     execute_query("""
@@ -47,14 +50,22 @@ def add_notification(user_id, content):
         VALUES (?, ?)
     """, (user_id, content))
 
-def already_notified(user_id, message):
-    result = fetch_one("""
-        SELECT 1 FROM ai_suggestions 
-        WHERE user_id = ? AND content = ? AND DATE(created_at) = DATE('now')
-    """, (user_id, message))
-    return result is not None
-
-def maybe_reset_commitments():
-    today = datetime.now()
-    if today.day == 1:
-        reset_commitments_monthly()
+def notification_hash(content):
+    return hashlib.sha1(content.encode()).hexdigest()
+
+def add_notifications(user_id, messages, day=None):
+    # at most one copy of each message per user per day, enforced by the unique
+    # (user_id, content_hash, notify_day) index. returns how many were new
+    if not messages:
+        return 0
+    day = (day or date.today()).isoformat()
+    return execute_many("""
+        INSERT INTO ai_suggestions (user_id, content, content_hash, notify_day)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    """, [(user_id, msg, notification_hash(msg), day) for msg in messages])
+
+def maybe_reset_commitments(user_id):
+    # once per month however often it's called, see core/scheduler.py
+    from core.scheduler import run_monthly_reset
+    return run_monthly_reset(user_id)
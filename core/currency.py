@@ -1,26 +1,253 @@
-import requests
+import csv
+import json
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+import numpy as np
+from core import http_client
+from database.db_manager import fetch_all, execute_many, close_thread_connection, register_function
 
 base_url = "https://api.exchangerate.host"
 
+# rates are fetched once per base currency and reused until they're this old (seconds)
+RATES_TTL = 6 * 60 * 60
+# how many base currencies to keep in memory, the fx_rates table holds the rest
+CACHE_SIZE = 16
+# after a failed fetch don't hit the network again for this long, whether nothing
+# was cached or a stale table was being revalidated
+RETRY_AFTER = 60
+
+_cache = OrderedDict()  # base -> (rates, fetched_at)
+_lock = threading.Lock()
+_refreshing = set()
+_failed = {}  # base -> time of the last failed fetch
+_history = {}  # (base, quote) -> (sorted dates, rates) from fx_history
+_missing = set()  # (from, to) pairs fx() had no rate for, warned about once
+
+
 def convert(amount, from_curr, to_curr):
     try:
-        url = f"{base_url}/convert"
-        params = {
-            "from": from_curr,
-            "to": to_curr,
-            "amount": amount
-        }
-        r = requests.get(url, params=params)
-        data = r.json()
-        return round(data["result"], 2)
+        if from_curr == to_curr:
+            return round(amount, 2)
+        rate = get_rates(from_curr).get(to_curr)
+        if rate is None:
+            return None
+        return round(amount * rate, 2)
     except:
         return None
 
+
+def convert_many(amounts, from_curr, to_curr):
+    # same as convert() for a whole list/array at once. None if there's no rate
+    amounts = np.asarray(amounts, dtype=float)
+    if from_curr == to_curr:
+        return np.round(amounts, 2)
+    rate = get_rates(from_curr).get(to_curr)
+    if rate is None:
+        return None
+    return np.round(amounts * rate, 2)
+
+
+def convert_rows(amounts, currencies, to_curr):
+    # per-row source currency (e.g. accounts.currency, None means USD).
+    # rows whose currency has no known rate keep their original amount
+    amounts = np.asarray(amounts, dtype=float)
+    if len(amounts) == 0:
+        return amounts
+    codes, idx = np.unique(np.asarray([c or "USD" for c in currencies]), return_inverse=True)
+    factors = np.array([_rate(c, to_curr) for c in codes])[idx]
+    return np.round(np.where(np.isnan(factors), amounts, amounts * factors), 2)
+
+
+def _rate(from_curr, to_curr):
+    # from the target currency's table, so a mixed list needs one rate table
+    if from_curr == to_curr:
+        return 1.0
+    inverse = get_rates(to_curr).get(from_curr)
+    if inverse:
+        return 1.0 / inverse
+    return get_rates(from_curr).get(to_curr, np.nan)
+
+
 def get_rates(base="USD"):
+    # memory -> fx_rates table -> network. stale rates are returned straight away
+    # and refreshed in the background; if we're offline the last known rates stay in use
+    with _lock:
+        entry = _cache.get(base)
+        if entry:
+            _cache.move_to_end(base)
+
+    if entry is None:
+        entry = _load_rates(base)
+        if entry:
+            _remember(base, *entry)
+
+    if entry is None:
+        if time.time() - _failed.get(base, 0) < RETRY_AFTER:
+            return {}
+        rates = fetch_rates(base)
+        if rates:
+            _store_rates(base, rates)
+            _failed.pop(base, None)
+        else:
+            _failed[base] = time.time()
+        return rates
+
+    rates, fetched_at = entry
+    if time.time() - fetched_at > RATES_TTL:
+        _refresh_in_background(base)
+    return rates
+
+
+def fetch_rates(base="USD"):
     try:
         url = f"{base_url}/latest"
-        r = requests.get(url, params={"base": base})
+        r = http_client.get("exchangerate", url, params={"base": base}, timeout=10)
         data = r.json()
         return data["rates"]
     except:
         return {}
+
+
+def clear_rate_cache():
+    with _lock:
+        _cache.clear()
+        _failed.clear()
+        _history.clear()
+        _missing.clear()
+
+
+def _remember(base, rates, fetched_at):
+    with _lock:
+        _cache[base] = (rates, fetched_at)
+        _cache.move_to_end(base)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _load_rates(base):
+    rows = fetch_all("SELECT quote, rate, fetched_at FROM fx_rates WHERE base = ?", (base,))
+    if not rows:
+        return None
+    return {r["quote"]: r["rate"] for r in rows}, min(r["fetched_at"] for r in rows)
+
+
+def _store_rates(base, rates):
+    now = time.time()
+    _remember(base, rates, now)
+    execute_many("""
+        INSERT INTO fx_rates (base, quote, rate, fetched_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(base, quote) DO UPDATE SET rate = excluded.rate, fetched_at = excluded.fetched_at
+    """, [(base, quote, rate, now) for quote, rate in rates.items()])
+
+
+def _refresh_in_background(base):
+    # stale rates are checked on every conversion (every keystroke in the transaction
+    # form), so a failed refresh also waits RETRY_AFTER before the next attempt
+    with _lock:
+        if base in _refreshing or time.time() - _failed.get(base, 0) < RETRY_AFTER:
+            return
+        _refreshing.add(base)
+
+    def run():
+        try:
+            rates = fetch_rates(base)
+            if rates:
+                _store_rates(base, rates)
+                _failed.pop(base, None)
+            else:
+                _failed[base] = time.time()
+        finally:
+            close_thread_connection()
+            with _lock:
+                _refreshing.discard(base)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# ========== HISTORICAL RATES ==========
+def load_fx_history(path):
+    # bulk load a rate dump into fx_history. accepts
+    #   csv with date,base,quote,rate columns
+    #   json list of {"date", "base", "quote", "rate"} objects
+    #   json timeseries {"base": "USD", "rates": {"2024-01-31": {"EUR": 0.92, ...}}}
+    # returns how many rates were stored
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = [(r["base"], r["quote"], r["date"][:10], float(r["rate"])) for r in csv.DictReader(f)]
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            base = data.get("base", "USD")
+            rows = [(base, quote, day[:10], float(rate))
+                    for day, rates in data["rates"].items() for quote, rate in rates.items()]
+        else:
+            rows = [(r["base"], r["quote"], r["date"][:10], float(r["rate"])) for r in data]
+
+    count = execute_many("""
+        INSERT INTO fx_history (base, quote, date, rate) VALUES (?, ?, ?, ?)
+        ON CONFLICT(base, quote, date) DO UPDATE SET rate = excluded.rate
+    """, rows)
+    with _lock:
+        _history.clear()
+    return count
+
+
+def historical_rate(from_curr, to_curr, date):
+    # rate on `date` or the closest earlier day we have (either direction of the pair).
+    # dates before the earliest fx_history row, and pairs with no history at all, use
+    # the latest rate from get_rates(). None if no rate is known
+    if from_curr == to_curr:
+        return 1.0
+    day = str(date)[:10] if date else time.strftime("%Y-%m-%d")
+
+    rate = _rate_on(from_curr, to_curr, day)
+    if rate is None:
+        inverse = _rate_on(to_curr, from_curr, day)
+        if inverse:
+            rate = 1.0 / inverse
+    if rate is None:
+        rate = _rate(from_curr, to_curr)
+    return None if rate is None or np.isnan(rate) else rate
+
+
+def convert_on(amount, from_curr, to_curr, date):
+    rate = historical_rate(from_curr, to_curr, date)
+    return None if rate is None else round(amount * rate, 2)
+
+
+def _rate_on(base, quote, day):
+    key = (base, quote)
+    with _lock:
+        series = _history.get(key)
+    if series is None:
+        rows = fetch_all("""
+            SELECT date, rate FROM fx_history WHERE base = ? AND quote = ? ORDER BY date
+        """, key)
+        series = ([r["date"] for r in rows], [r["rate"] for r in rows])
+        with _lock:
+            _history[key] = series
+
+    dates, rates = series
+    i = bisect_right(dates, day)
+    return rates[i - 1] if i else None
+
+
+def _fx_sql(amount, from_curr, date, to_curr):
+    # SUM(fx(t.amount, a.currency, t.date, ?)) in sql. NULL when there's no rate, so
+    # the sum leaves that amount out instead of adding it in the wrong currency
+    if amount is None:
+        return None
+    pair = (from_curr or "USD", to_curr or "USD")
+    rate = historical_rate(*pair, date)
+    if rate is None:
+        if pair not in _missing:
+            _missing.add(pair)
+            print(f"⚠️ no {pair[0]}->{pair[1]} rate, those amounts are left out of converted totals")
+        return None
+    return amount * rate
+
+
+register_function("fx", 4, _fx_sql)
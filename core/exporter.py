@@ -1,52 +1,324 @@
-
 import csv
-from fpdf import FPDF
-from core.transactions import get_all_txns
-from PyQt5.QtWidgets import QFileDialog
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from database.db_manager import fetch_all, close_thread_connection
+from core.transactions import iter_txn_pages, count_txns, resolve_categories, import_txns
+from core.report import write_pdf_report
 
-def export_csv(user_id, parent=None):
-    txns = get_all_txns(user_id)
-    if not txns:
+# qt is only imported by the dialog wrappers (export_csv / export_pdf), the
+# write_* functions run headless. the pdf report itself lives in core/report.py
+
+CSV_HEADER = ["date", "type", "amount", "category", "account", "desc"]
+# bytes buffered before each write to disk
+WRITE_BUFFER = 1 << 20
+
+def write_csv(user_id, path, compress=None, progress=None, cancel=None, page_size=1000, **filters):
+    # streams the user's transactions to path a page at a time, so memory stays flat
+    # however long the history is. compress defaults to on for *.gz paths.
+    # progress(done, total) is called after every page; setting the cancel event stops
+    # the export between pages. the file only appears once it's complete
+    if compress is None:
+        compress = path.endswith(".gz")
+    total = count_txns(user_id, **filters)
+    if not total:
         return False, "no data to export"
 
-    path, _ = QFileDialog.getSaveFileName(parent, "save as", "transactions.csv", "CSV files (*.csv)")
-    if not path:
+    tmp = path + ".part"
+    done = 0
+    try:
+        if compress:
+            f = gzip.open(tmp, "wt", newline="", compresslevel=6)
+        else:
+            f = open(tmp, "w", newline="", buffering=WRITE_BUFFER)
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for page in iter_txn_pages(user_id, page_size=page_size, **filters):
+                if cancel is not None and cancel.is_set():
+                    raise InterruptedError
+                writer.writerows([
+                    t.date, t.transaction_type, t.amount,
+                    t.category_name, t.bank_name, t.description or ""
+                ] for t in page)
+                done += len(page)
+                if progress:
+                    progress(done, total)
+        os.replace(tmp, path)
+        return True, f"{done} rows saved"
+    except InterruptedError:
         return False, "cancelled"
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
+# columnar export. pyarrow is optional, only these functions need it
+ARROW_FORMAT_VERSION = "1"
+
+def _pyarrow():
     try:
-        with open(path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["date", "type", "amount", "category", "account", "desc"])
-            for t in txns:
-                writer.writerow([
-                    t["date"], t["transaction_type"], t["amount"],
-                    t["category_name"], t["bank_name"], t["description"] or ""
-                ])
-        return True, "csv saved"
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("parquet/arrow export needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+def _arrow_schema(pa):
+    # amounts are kept as entered with their account currency next to them, nothing
+    # is converted so a round trip is lossless
+    label = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("transaction_id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("transaction_type", label),
+        ("amount", pa.float64()),
+        ("currency", label),
+        ("category", label),
+        ("account_id", pa.string()),
+        ("account", label),
+        ("description", pa.string()),
+        ("is_recurring", pa.bool_()),
+        ("fingerprint", pa.string()),
+    ], metadata={"pennywise": ARROW_FORMAT_VERSION})
+
+def _parse_dates(values):
+    # dates are stored as 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS[.ffffff]' text. numpy
+    # parses a whole page at once, anything odd falls back to one at a time
+    try:
+        return np.array([str(v) if v is not None else "NaT" for v in values], dtype="datetime64[us]")
+    except ValueError:
+        parsed = []
+        for v in values:
+            try:
+                parsed.append(datetime.fromisoformat(str(v)))
+            except ValueError:
+                parsed.append(None)
+        return parsed
+
+def _record_batch(pa, schema, page):
+    columns = [
+        [t.transaction_id for t in page],
+        _parse_dates([t.date for t in page]),
+        [t.transaction_type for t in page],
+        [t.amount for t in page],
+        [t.account_currency or "USD" for t in page],
+        [t.category_name for t in page],
+        [None if t.account_id is None else str(t.account_id) for t in page],
+        [t.bank_name for t in page],
+        [t.description for t in page],
+        [bool(t.is_recurring) for t in page],
+        [t.fingerprint for t in page],
+    ]
+    arrays = [
+        pa.array(values, type=field.type.value_type).dictionary_encode()
+        if pa.types.is_dictionary(field.type) else pa.array(values, type=field.type)
+        for values, field in zip(columns, schema)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_arrow(user_id, path, progress=None, cancel=None, page_size=10000, **filters):
+    # parquet for *.parquet, the arrow ipc file format for anything else (.arrow / .feather).
+    # one record batch (parquet row group) per page of the transaction stream
+    try:
+        pa = _pyarrow()
+    except RuntimeError as e:
+        return False, str(e)
+    total = count_txns(user_id, **filters)
+    if not total:
+        return False, "no data to export"
+
+    schema = _arrow_schema(pa)
+    tmp = path + ".part"
+    done = 0
+    try:
+        if path.endswith(".parquet"):
+            writer = pa.parquet.ParquetWriter(tmp, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(tmp, schema)
+        with writer:
+            for page in iter_txn_pages(user_id, page_size=page_size, convert=False, **filters):
+                if cancel is not None and cancel.is_set():
+                    raise InterruptedError
+                batch = _record_batch(pa, schema, page)
+                if path.endswith(".parquet"):
+                    writer.write_batch(batch, row_group_size=page_size)
+                else:
+                    writer.write_batch(batch)
+                done += len(page)
+                if progress:
+                    progress(done, total)
+        os.replace(tmp, path)
+        return True, f"{done} rows saved"
+    except InterruptedError:
+        return False, "cancelled"
     except Exception as e:
         return False, str(e)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _arrow_batches(pa, path, batch_size):
+    if path.endswith(".parquet"):
+        yield from pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+def _arrow_row_count(pa, path):
+    if path.endswith(".parquet"):
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+def _stored_date(text):
+    # arrow's timestamp-to-text cast back to what the app stores: plain dates stay
+    # 'YYYY-MM-DD', whole seconds lose the '.000000'
+    if text is None:
+        return None
+    if text.endswith(" 00:00:00.000000"):
+        return text[:10]
+    if text.endswith(".000000"):
+        return text[:-7]
+    return text
+
+def _import_fingerprint(row):
+    # rows exported without one (manual entries) get a stable one from their source
+    # id and contents, so importing the same file again is a no-op
+    key = f"import:{row['transaction_id']}|{row['date']}|{row['amount']}|{row['transaction_type']}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _present_rows(user_id, rows):
+    # rows exported without a fingerprint (manual entries) that are going back into the
+    # database they came from: same id, day, amount and type means it's the same row.
+    # returns the keys (_row_key) of the ones already there
+    ids = [r["transaction_id"] for r in rows if not r.get("fingerprint") and r.get("transaction_id") is not None]
+    present = set()
+    for i in range(0, len(ids), 900):
+        chunk = ids[i:i + 900]
+        # by primary key only: with user_id in the where clause sqlite prefers the
+        # user index and walks every row the user has
+        found = fetch_all(f"""
+            SELECT user_id, transaction_id, date, amount, transaction_type FROM transactions
+            WHERE transaction_id IN ({",".join("?" * len(chunk))})
+        """, chunk)
+        present.update(_row_key(r) for r in found if r["user_id"] == user_id)
+    return present
+
+def _row_key(row):
+    # the day only, stored dates come both as 'YYYY-MM-DD' and with a time
+    return row["transaction_id"], str(row["date"])[:10], row["amount"], row["transaction_type"]
+
+def read_arrow(user_id, path, progress=None, cancel=None, batch_size=10000):
+    # bulk import of a file written by write_arrow (or anything with the same column
+    # names). categories are matched by name and created if missing. returns (ok, message)
+    try:
+        pa = _pyarrow()
+    except RuntimeError as e:
+        return False, str(e)
+
+    added = seen = 0
+    try:
+        total = _arrow_row_count(pa, path)
+        for batch in _arrow_batches(pa, path, batch_size):
+            if cancel is not None and cancel.is_set():
+                return False, f"cancelled after {added} new rows"
+            # timestamps go to text in arrow, much faster than a datetime per row
+            table = pa.Table.from_batches([batch])
+            if "date" in table.column_names and pa.types.is_timestamp(table.schema.field("date").type):
+                i = table.column_names.index("date")
+                table = table.set_column(i, "date", table.column(i).cast(pa.string()))
+            rows = table.to_pylist()
+            for r in rows:
+                r["date"] = _stored_date(r.get("date"))
+            seen += len(rows)
+
+            present = _present_rows(user_id, rows)
+            if present:
+                rows = [r for r in rows if r.get("fingerprint") or _row_key(r) not in present]
+            cat_ids = resolve_categories(user_id, (r.get("category") for r in rows))
+            for r in rows:
+                r["category_id"] = cat_ids.get(r.get("category"))
+                r["fingerprint"] = r.get("fingerprint") or _import_fingerprint(r)
+            added += import_txns(user_id, rows)
+            if progress:
+                progress(seen, total or seen)
+    except Exception as e:
+        return False, str(e)
+    return True, f"{added} new rows imported, {seen - added} already present"
+
+def run_in_background(func, *args, **kwargs):
+    # runs func on a worker thread with a fresh cancel event passed in as cancel=.
+    # returns (thread, cancel, result) where result["value"] is set once it finishes
+    cancel = threading.Event()
+    result = {}
+
+    def work():
+        try:
+            result["value"] = func(*args, cancel=cancel, **kwargs)
+        except Exception as e:
+            result["value"] = (False, str(e))
+        finally:
+            close_thread_connection()
+
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    return thread, cancel, result
+
+def _run_with_dialog(parent, label, func, *args):
+    # runs func(*args, progress=, cancel=) on a worker thread behind a progress dialog
+    from PyQt5.QtWidgets import QProgressDialog, QApplication
+
+    dialog = QProgressDialog(label, "cancel", 0, 100, parent)
+    dialog.setMinimumDuration(300)
+    state = {"done": 0, "total": 0}
+
+    def progress(done, total):
+        state["done"], state["total"] = done, total
+
+    thread, cancel, result = run_in_background(func, *args, progress=progress)
+    while thread.is_alive():
+        if dialog.wasCanceled():
+            cancel.set()
+        if state["total"]:
+            dialog.setValue(int(state["done"] * 100 / state["total"]))
+        QApplication.processEvents()
+        thread.join(0.05)
+    dialog.close()
+    return result["value"]
+
+def export_csv(user_id, parent=None):
+    from PyQt5.QtWidgets import QFileDialog
+
+    if not count_txns(user_id):
+        return False, "no data to export"
+
+    path, _ = QFileDialog.getSaveFileName(
+        parent, "save as", "transactions.csv",
+        "CSV files (*.csv);;Compressed CSV (*.csv.gz);;Parquet (*.parquet);;Arrow (*.arrow)"
+    )
+    if not path:
+        return False, "cancelled"
+
+    writer = write_arrow if path.endswith((".parquet", ".arrow", ".feather")) else write_csv
+    return _run_with_dialog(parent, "exporting transactions...", writer, user_id, path)
 
 def export_pdf(user_id, parent=None):
-    txns = get_all_txns(user_id)
-    if not txns:
+    from PyQt5.QtWidgets import QFileDialog
+
+    if not count_txns(user_id):
         return False, "no data to export"
 
     path, _ = QFileDialog.getSaveFileName(parent, "save as", "transactions.pdf", "PDF files (*.pdf)")
     if not path:
         return False, "cancelled"
 
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Transaction History", ln=True, align="C")
-        pdf.ln(10)
-
-        for t in txns:
-            line = f"{t['date']} | {t['transaction_type']} | {t['amount']} | {t['category_name']} | {t['bank_name']} | {t['description'] or ''}"
-            pdf.cell(200, 8, txt=line, ln=True)
-
-        pdf.output(path)
-        return True, "pdf saved"
-    except Exception as e:
-        return False, str(e)
+    return _run_with_dialog(parent, "building report...", write_pdf_report, user_id, path)
@@ -0,0 +1,236 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# shared outbound http for every provider (groq, exchangerate.host, plaid):
+# pooled session per host, token bucket per provider, retries with backoff on
+# 429/5xx and failed connections, a circuit breaker that fails fast while a
+# provider is down, and latency histograms per endpoint
+
+# seconds, (connect, read)
+DEFAULT_TIMEOUT = (5, 30)
+
+# rate = requests per second, burst = bucket size, failures = consecutive
+# failures that open the circuit, cooldown = seconds before trying again.
+# retry_reads = also retry requests whose reply timed out (ReadTimeout).
+# only safe where repeating the call is harmless: groq and plaid are POSTs
+# (a tip request, a token exchange, a sync page), so a slow reply isn't resent
+PROVIDERS = {
+    "groq": {"rate": 1, "burst": 5, "retries": 2, "failures": 3, "cooldown": 60, "retry_reads": False},
+    "exchangerate": {"rate": 2, "burst": 5, "retries": 2, "failures": 3, "cooldown": 120, "retry_reads": True},
+    "plaid": {"rate": 5, "burst": 10, "retries": 3, "failures": 5, "cooldown": 30, "retry_reads": False},
+}
+DEFAULT_PROVIDER = {"rate": 5, "burst": 10, "retries": 2, "failures": 5, "cooldown": 30, "retry_reads": False}
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# upper bounds in ms, the last bucket catches everything slower
+LATENCY_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # blocks until a token is free
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        # open: refuse until the cooldown passes, then let a single call through as a
+        # probe (half open). everyone else is refused until the probe's success closes
+        # the circuit; its failure reopens it. a probe that never reports back is
+        # replaced after another cooldown
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.cooldown:
+                self.opened_at = now
+                self.failures = self.max_failures - 1
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        with self.lock:
+            self.counts[bisect_left(LATENCY_BUCKETS, ms)] += 1
+            self.total += ms
+
+    def snapshot(self):
+        with self.lock:
+            n = sum(self.counts)
+            labels = [f"<={b}ms" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}ms"]
+            return {
+                "count": n,
+                "mean_ms": round(self.total / n, 1) if n else 0.0,
+                "buckets": dict(zip(labels, self.counts))
+            }
+
+
+_sessions = {}
+_limiters = {}
+_breakers = {}
+_histograms = {}
+_lock = threading.Lock()
+
+
+def session_for(url):
+    # one keep-alive session per host
+    host = urlsplit(url).netloc
+    with _lock:
+        s = _sessions.get(host)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _sessions[host] = s
+        return s
+
+
+def _provider_state(provider):
+    with _lock:
+        if provider not in _limiters:
+            conf = PROVIDERS.get(provider, DEFAULT_PROVIDER)
+            _limiters[provider] = TokenBucket(conf["rate"], conf["burst"])
+            _breakers[provider] = CircuitBreaker(conf["failures"], conf["cooldown"])
+        return _limiters[provider], _breakers[provider]
+
+
+def _observe(provider, method, url, seconds):
+    key = f"{provider} {method.upper()} {urlsplit(url).path or '/'}"
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = LatencyHistogram()
+    hist.observe(seconds)
+
+
+def _backoff(attempt, retry_after=None):
+    # exponential with full jitter, but honour a numeric Retry-After from the server
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _retryable(exc, conf):
+    # a failed connect never reached the server, so it's safe to send again.
+    # ConnectTimeout is a ConnectionError too. read timeouts only where opted in
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return True
+    return conf["retry_reads"] and isinstance(exc, requests.exceptions.Timeout)
+
+
+def request(provider, method, url, retries=None, **kwargs):
+    # same as requests.request but rate limited, retried and circuit broken per provider.
+    # raises CircuitOpenError (a requests ConnectionError) while the provider is marked down
+    limiter, breaker = _provider_state(provider)
+    conf = PROVIDERS.get(provider, DEFAULT_PROVIDER)
+    if retries is None:
+        retries = conf["retries"]
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{provider} is unavailable, try again later")
+
+        limiter.acquire()
+        start = time.perf_counter()
+        try:
+            res = session_for(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            _observe(provider, method, url, time.perf_counter() - start)
+            breaker.record_failure()
+            if attempt == retries or not _retryable(e, conf):
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        _observe(provider, method, url, time.perf_counter() - start)
+
+        if res.status_code == 429 or res.status_code >= 500:
+            breaker.record_failure()
+            if attempt == retries:
+                return res
+            time.sleep(_backoff(attempt, res.headers.get("Retry-After")))
+            continue
+
+        breaker.record_success()
+        return res
+
+
+def get(provider, url, **kwargs):
+    return request(provider, "GET", url, **kwargs)
+
+
+def post(provider, url, **kwargs):
+    return request(provider, "POST", url, **kwargs)
+
+
+def latency_stats():
+    with _lock:
+        items = list(_histograms.items())
+    return {key: hist.snapshot() for key, hist in items}
+
+
+def circuit_status():
+    with _lock:
+        breakers = dict(_breakers)
+    return {name: ("open" if b.is_open else "closed") for name, b in breakers.items()}
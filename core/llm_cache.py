@@ -0,0 +1,76 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from database.db_manager import fetch_one, execute_query, transaction
+
+# how long a cached answer stays usable (seconds) and how many we keep
+CACHE_TTL = 7 * 24 * 60 * 60
+CACHE_MAX_ENTRIES = 500
+# amounts within ~10% of each other land in the same bucket, so
+# "spent 412.50 of 400" and "spent 415.00 of 400" share an answer
+BUCKET_RATIO = 1.1
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_number = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def bucket_number(value):
+    if value <= 0:
+        return "0"
+    return f"b{math.floor(math.log(value) / math.log(BUCKET_RATIO))}"
+
+
+def normalize_summary(summary):
+    text = " ".join(summary.lower().split())
+    return _number.sub(lambda m: bucket_number(float(m.group().replace(",", ""))), text)
+
+
+def cache_key(model, system_prompt, summary, temperature):
+    payload = json.dumps([model, system_prompt, normalize_summary(summary), temperature])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_cached(key):
+    row = fetch_one("SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,))
+    now = time.time()
+    if not row or now - row["created_at"] > CACHE_TTL:
+        _count("misses")
+        return None
+
+    execute_query("UPDATE llm_cache SET last_hit = ? WHERE cache_key = ?", (now, key))
+    _count("hits")
+    return row["response"]
+
+
+def put_cached(key, response):
+    now = time.time()
+    with transaction():
+        execute_query("""
+            INSERT INTO llm_cache (cache_key, response, created_at, last_hit) VALUES (?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                response = excluded.response, created_at = excluded.created_at, last_hit = excluded.last_hit
+        """, (key, response, now, now))
+        # drop expired answers and anything past the size limit, least recently used first
+        execute_query("DELETE FROM llm_cache WHERE created_at < ?", (now - CACHE_TTL,))
+        execute_query("""
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+            )
+        """, (CACHE_MAX_ENTRIES,))
+
+
+def cache_stats():
+    row = fetch_one("SELECT COUNT(*) AS n FROM llm_cache")
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["entries"] = row["n"] if row else 0
+    return stats
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
@@ -1,16 +1,22 @@
+import os
 import uuid
 import random
 import datetime
-import requests
+from core import http_client
 
 # plad sandbox credentials
 client_id = "."
 secret = "."
-base_url = "https://sandbox.plaid.com"
+# PLAID_BASE_URL can point at a local mock server for offline testing, see tests/mock_plaid_server.py
+base_url = os.getenv("PLAID_BASE_URL") or "https://sandbox.plaid.com"
 
 # toggle mock mode (True = use fake data, False = use real Plaid API)
 use_mock = False
 
+# seconds, (connect, read). calls go through the shared http_client, which keeps
+# one keep-alive session per host for every refresh thread
+timeout = (5, 30)
+
 
 # ========== MOCK MODE [TESTING]==========
 def mock_create_link_token(user_id):
@@ -40,6 +46,33 @@ def mock_get_accounts(user_id):
         ]
     }
 
+# fixed fake history so the sync cursor pages through the same data every time
+MOCK_SYNC_TXNS = [
+    {
+        "transaction_id": f"mock_txn_{i:04d}",
+        "account_id": "mock_acc_checking",
+        "amount": round(((i * 37) % 200) + 4.99, 2) * (-1 if i % 10 == 0 else 1),
+        "date": (datetime.date(2025, 1, 1) + datetime.timedelta(days=i // 3)).isoformat(),
+        "name": ["Coffee Shop", "Grocery Store", "Uber", "Netflix", "Payroll"][i % 5],
+        "category": [["Food and Drink", "Coffee"], ["Shops", "Groceries"], ["Travel", "Taxi"],
+                     ["Service", "Subscription"], ["Transfer", "Payroll"]][i % 5]
+    }
+    for i in range(1200)
+]
+
+def mock_sync_page(access_token, cursor, count):
+    # cursor is just the offset into MOCK_SYNC_TXNS
+    start = int(cursor or 0)
+    page = MOCK_SYNC_TXNS[start:start + count]
+    next_cursor = str(start + len(page))
+    return {
+        "added": page,
+        "modified": [],
+        "removed": [],
+        "next_cursor": next_cursor,
+        "has_more": start + len(page) < len(MOCK_SYNC_TXNS)
+    }
+
 
 # ========== REAL PLAID MODE ==========
 def real_create_link_token(user_id):
@@ -55,7 +88,7 @@ def real_create_link_token(user_id):
         "language": "en"
     }
     try:
-        res = requests.post(url, headers=headers, json=body)
+        res = http_client.post("plaid", url, headers=headers, json=body, timeout=timeout)
         return res.json()
     except Exception as e:
         return {"error": str(e)}
@@ -68,7 +101,7 @@ def exchange_public_token(public_token):
         "public_token": public_token
     }
     try:
-        res = requests.post(url, json=data)
+        res = http_client.post("plaid", url, json=data, timeout=timeout)
         return res.json()
     except Exception as e:
         return {"error": str(e)}
@@ -81,11 +114,27 @@ def real_get_accounts(access_token):
         "access_token": access_token
     }
     try:
-        res = requests.post(url, json=data)
+        res = http_client.post("plaid", url, json=data, timeout=timeout)
         return res.json()
     except Exception as e:
         return {"accounts": [], "error": str(e)}
 
+def real_sync_page(access_token, cursor, count):
+    url = f"{base_url}/transactions/sync"
+    data = {
+        "client_id": client_id,
+        "secret": secret,
+        "access_token": access_token,
+        "count": count
+    }
+    if cursor:
+        data["cursor"] = cursor
+    try:
+        res = http_client.post("plaid", url, json=data, timeout=timeout)
+        return res.json()
+    except Exception as e:
+        return {"error": str(e)}
+
 
 # ========== UNIFIED INTERFACE ==========
 def create_link_token(user_id):
@@ -103,6 +152,35 @@ def get_transactions(access_token, start_date, end_date):
         "start_date": start_date,
         "end_date": end_date
     }
-    res = requests.post(url, json=data)
+    res = http_client.post("plaid", url, json=data, timeout=timeout)
     return res.json()
 
+def sync_transactions(access_token, cursor=None, count=500):
+    # incremental fetch through /transactions/sync. pages until has_more is false and
+    # returns everything that changed since `cursor` plus the cursor to store for next time
+    sync_page = mock_sync_page if use_mock else real_sync_page
+    start_cursor = cursor
+    restarts = 0
+    added, modified, removed = [], [], []
+
+    while True:
+        page = sync_page(access_token, cursor, count)
+
+        if page.get("error_code") == "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION" and restarts < 3:
+            # plaid wants the whole run restarted from the cursor we began with
+            restarts += 1
+            cursor = start_cursor
+            added, modified, removed = [], [], []
+            continue
+        if "error" in page or "error_code" in page:
+            return {"error": page.get("error") or page.get("error_message") or page["error_code"]}
+
+        added.extend(page.get("added", []))
+        modified.extend(page.get("modified", []))
+        removed.extend(page.get("removed", []))
+        cursor = page.get("next_cursor", cursor)
+
+        if not page.get("has_more"):
+            break
+
+    return {"added": added, "modified": modified, "removed": removed, "next_cursor": cursor}
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from database.db_manager import fetch_one, fetch_all, execute_query, execute_many, transaction
+from core.plaid_api import get_accounts, sync_transactions
+from core.transactions import (
+    ingest_plaid_transactions, update_plaid_transactions, remove_plaid_transactions
+)
+
+
+def get_cursor(access_token):
+    row = fetch_one("SELECT sync_cursor FROM plaid_items WHERE plaid_token = ?", (access_token,))
+    return row["sync_cursor"] if row else None
+
+
+def linked_tokens(user_id):
+    # every access token linked for the user, from accounts and from sync state
+    rows = fetch_all("""
+        SELECT plaid_token FROM accounts WHERE user_id = ? AND plaid_token IS NOT NULL
+        UNION
+        SELECT plaid_token FROM plaid_items WHERE user_id = ?
+    """, (user_id, user_id))
+    return [r["plaid_token"] for r in rows]
+
+
+def save_cursor(user_id, access_token, cursor):
+    execute_query("""
+        INSERT INTO plaid_items (plaid_token, user_id, sync_cursor, last_sync)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(plaid_token) DO UPDATE SET
+            sync_cursor = excluded.sync_cursor,
+            last_sync = excluded.last_sync
+    """, (access_token, user_id, cursor, datetime.now().isoformat()), commit=True)
+
+
+def save_plaid_accounts(user_id, access_token, accounts):
+    now = datetime.now().isoformat()
+    rows = [(
+        user_id,
+        acc["account_id"],
+        acc.get("name", "Unknown Bank"),
+        "salary" if "checking" in acc.get("subtype", "").lower() else "savings",
+        acc.get("balances", {}).get("iso_currency_code") or "USD",
+        access_token,
+        now
+    ) for acc in accounts]
+
+    # one row per (user_id, account_id), migration 12
+    execute_many("""
+        INSERT INTO accounts (
+            user_id, account_id, bank_name, account_type, currency, plaid_token, last_sync
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, account_id) DO UPDATE SET
+            bank_name = excluded.bank_name,
+            account_type = excluded.account_type,
+            currency = excluded.currency,
+            plaid_token = excluded.plaid_token,
+            last_sync = excluded.last_sync
+    """, rows)
+
+
+def apply_sync(user_id, access_token, result):
+    # writes one sync result and its new cursor in a single transaction, so a crash
+    # never leaves the cursor ahead of the data
+    with transaction():
+        counts = {
+            "added": ingest_plaid_transactions(user_id, result.get("added", [])),
+            "modified": update_plaid_transactions(user_id, result.get("modified", [])),
+            "removed": remove_plaid_transactions(user_id, result.get("removed", []))
+        }
+        save_cursor(user_id, access_token, result.get("next_cursor"))
+    return counts
+
+
+def sync_item(user_id, access_token):
+    # fetch only what changed since the stored cursor (everything on the first run)
+    result = sync_transactions(access_token, get_cursor(access_token))
+    if "error" in result:
+        return result
+    return apply_sync(user_id, access_token, result)
+
+
+def link_item(user_id, access_token):
+    # store the item's accounts then pull its transactions
+    accounts = get_accounts(access_token)
+    if "error" in accounts:
+        return accounts
+    save_plaid_accounts(user_id, access_token, accounts.get("accounts", []))
+
+    result = sync_item(user_id, access_token)
+    if "error" in result:
+        return result
+    return {"accounts": accounts.get("accounts", []), "synced": result}
+
+
+def fetch_item(access_token, cursor):
+    # network half of a refresh. no db access so it can run on any thread
+    accounts = get_accounts(access_token)
+    if "error" in accounts:
+        return {"error": accounts["error"]}
+    result = sync_transactions(access_token, cursor)
+    if "error" in result:
+        return {"error": result["error"]}
+    return {"accounts": accounts.get("accounts", []), "sync": result}
+
+
+def refresh_items(user_id, access_tokens, max_workers=4, progress=None):
+    # fetches every linked item in parallel, then writes all of it in one db batch.
+    # progress(done, total) is called from the calling thread as items come back
+    access_tokens = list(access_tokens)
+    cursors = {token: get_cursor(token) for token in access_tokens}
+    fetched = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(access_tokens) or 1))) as pool:
+        futures = {pool.submit(fetch_item, token, cursors[token]): token for token in access_tokens}
+        for done, future in enumerate(as_completed(futures), 1):
+            token = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                data = {"error": str(e)}
+
+            if "error" in data:
+                errors[token] = data["error"]
+            else:
+                fetched[token] = data
+            if progress:
+                progress(done, len(access_tokens))
+
+    accounts = []
+    totals = {"added": 0, "modified": 0, "removed": 0}
+    with transaction():
+        for token, data in fetched.items():
+            save_plaid_accounts(user_id, token, data["accounts"])
+            for key, count in apply_sync(user_id, token, data["sync"]).items():
+                totals[key] += count
+            accounts.extend(data["accounts"])
+
+    return {"accounts": accounts, "synced": totals, "errors": errors}
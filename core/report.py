@@ -0,0 +1,169 @@
+from fpdf import FPDF
+from core.transactions import iter_txn_pages, count_txns
+
+# paginated transaction report: a table with repeated column headers on every page,
+# a subtotal row whenever the month changes and a category summary at the end.
+# rows are streamed from the db, only the per-category totals are kept around
+
+# (title, width in mm, align, max chars). widths add up to the printable A4 width
+COLUMNS = [
+    ("Date", 24, "L", 10),
+    ("Type", 18, "L", 8),
+    ("Category", 38, "L", 20),
+    ("Account", 34, "L", 18),
+    ("Description", 56, "L", 32),
+    ("Amount", 24, "R", 14),
+]
+ROW_HEIGHT = 5
+MARGIN = 8
+
+HEADER_FILL = (214, 115, 58)    # the app's orange
+SUBTOTAL_FILL = (240, 240, 240)
+
+
+def _text(value, limit=None):
+    # the core pdf fonts are latin-1 only, and clipping by character count is much
+    # cheaper than measuring every string
+    text = "" if value is None else str(value)
+    if limit and len(text) > limit:
+        text = text[:limit - 1] + "~"
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+class _OutputBuffer:
+    # fpdf 1.7 builds the whole file with `self.buffer += chunk`, which copies the
+    # buffer on every append and goes quadratic once there are thousands of pages.
+    # this collects the chunks instead and only joins them when the file is written
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def __iadd__(self, chunk):
+        self.parts.append(chunk)
+        self.size += len(chunk)
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return "".join(self.parts)
+
+    def encode(self, *args):
+        return str(self).encode(*args)
+
+
+class TransactionReport(FPDF):
+    def __init__(self, title, columns=COLUMNS):
+        super().__init__(orientation="P", unit="mm", format="A4")
+        self.buffer = _OutputBuffer()
+        self.title = _text(title)
+        self.columns = columns
+        self.set_margins(MARGIN, MARGIN, MARGIN)
+        self.set_auto_page_break(True, margin=12)
+        self.alias_nb_pages()
+        # set by the summary page, which has its own columns
+        self.table_header = True
+
+    def header(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 8, self.title, 0, 1, "L")
+        if self.table_header:
+            self.set_font("Arial", "B", 8)
+            self.set_fill_color(*HEADER_FILL)
+            self.set_text_color(255, 255, 255)
+            for title, width, align, _ in self.columns:
+                self.cell(width, ROW_HEIGHT + 1, title, 0, 0, align, True)
+            self.ln()
+            self.set_text_color(0, 0, 0)
+        self.set_font("Arial", "", 8)
+
+    def footer(self):
+        self.set_y(-10)
+        self.set_font("Arial", "I", 7)
+        self.cell(0, 5, f"Page {self.page_no()}/{{nb}}", 0, 0, "C")
+        self.set_font("Arial", "", 8)
+
+    def row(self, values):
+        for value, (_, width, align, limit) in zip(values, self.columns):
+            self.cell(width, ROW_HEIGHT, _text(value, limit), 0, 0, align)
+        self.ln()
+
+    def subtotal(self, label, income, expense):
+        self.set_font("Arial", "B", 8)
+        self.set_fill_color(*SUBTOTAL_FILL)
+        label_width = sum(c[1] for c in self.columns[:-1])
+        self.cell(label_width, ROW_HEIGHT,
+                  _text(f"{label}   income {income:,.2f}   expense {expense:,.2f}   net"), 0, 0, "R", True)
+        self.cell(self.columns[-1][1], ROW_HEIGHT, f"{income - expense:,.2f}", 0, 1, "R", True)
+        self.set_font("Arial", "", 8)
+
+
+def write_pdf_report(user_id, path, progress=None, cancel=None, page_size=1000, **filters):
+    # same contract as exporter.write_csv: progress(done, total) per page, a set cancel
+    # event stops between pages, returns (ok, message)
+    total = count_txns(user_id, **filters)
+    if not total:
+        return False, "no data to export"
+
+    pdf = TransactionReport("PennyWise - Transaction History")
+    pdf.add_page()
+
+    month = None
+    month_in = month_out = 0.0
+    categories = {}  # name -> [expense, income, count]
+    done = 0
+
+    for page in iter_txn_pages(user_id, page_size=page_size, **filters):
+        if cancel is not None and cancel.is_set():
+            return False, "cancelled"
+        for t in page:
+            date = str(t.date or "")
+            if date[:7] != month:
+                if month is not None:
+                    pdf.subtotal(month, month_in, month_out)
+                month, month_in, month_out = date[:7], 0.0, 0.0
+
+            amount = t.amount or 0
+            income = t.transaction_type == "income"
+            if income:
+                month_in += amount
+            else:
+                month_out += amount
+            cat = categories.setdefault(t.category_name or "Uncategorized", [0.0, 0.0, 0])
+            cat[1 if income else 0] += amount
+            cat[2] += 1
+
+            pdf.row((date[:10], t.transaction_type, t.category_name or "", t.bank_name or "",
+                     t.description or "", f"{amount:,.2f}"))
+        done += len(page)
+        if progress:
+            progress(done, total)
+
+    pdf.subtotal(month, month_in, month_out)
+
+    # category summary on its own page(s)
+    pdf.table_header = False
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 10)
+    pdf.cell(0, 7, "Summary by category", 0, 1)
+    summary = [("Category", 60, "L"), ("Transactions", 30, "R"), ("Expense", 35, "R"),
+               ("Income", 35, "R"), ("Share of spend", 34, "R")]
+    pdf.set_font("Arial", "B", 8)
+    for title, width, align in summary:
+        pdf.cell(width, ROW_HEIGHT + 1, title, "B", 0, align)
+    pdf.ln()
+    pdf.set_font("Arial", "", 8)
+
+    spend = sum(c[0] for c in categories.values()) or 1
+    for name, (expense, income, count) in sorted(categories.items(), key=lambda i: i[1][0], reverse=True):
+        values = (_text(name, 34), str(count), f"{expense:,.2f}", f"{income:,.2f}", f"{expense / spend:.1%}")
+        for value, (_, width, align) in zip(values, summary):
+            pdf.cell(width, ROW_HEIGHT, value, 0, 0, align)
+        pdf.ln()
+
+    try:
+        pdf.output(path, "F")
+    except Exception as e:
+        return False, str(e)
+    return True, f"{done} rows, {pdf.page_no()} pages saved"
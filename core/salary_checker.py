@@ -1,6 +1,6 @@
 from database.db_manager import execute_query
 from datetime import datetime
-from core.commitment_manager import add_notification
+from core.commitment_manager import add_notification,add_notifications
 from database.db_manager import fetch_one
 
 
@@ -39,6 +39,6 @@ def check_salary_reminder(user_id):
     days_until = expected_day - today
 
     if 0 < days_until <= 7:
-        add_notification(user_id, f"💼 Your salary is expected in {days_until} day(s). Don't forget your commitments.")
+        add_notifications(user_id, [f"💼 Your salary is expected in {days_until} day(s). Don't forget your commitments."])
     elif expected_day == today:
-        add_notification(user_id, "💸 It's salary day today! Review your commitments and savings goals.")
+        add_notifications(user_id, ["💸 It's salary day today! Review your commitments and savings goals."])
@@ -0,0 +1,149 @@
+import heapq
+import threading
+import time
+import traceback
+from datetime import datetime, date, time as clock, timedelta
+
+from database.db_manager import fetch_all, execute_query, transaction, close_thread_connection
+from core.commitment_manager import check_commitments, reset_commitments_monthly
+from core.salary_checker import check_salary_reminder
+
+# in-process scheduler for the per-user housekeeping jobs. due times live in
+# scheduled_jobs so a restart picks up where the last session stopped, and a job
+# that came due while the app was closed runs once as soon as it starts
+
+# seconds before a failed job is tried again
+RETRY_DELAY = 15 * 60
+# never sleep longer than this, so a suspended laptop or a clock change is noticed
+MAX_SLEEP = 300
+# daily jobs run just after local midnight
+DAILY_AT = (0, 1)
+
+
+def next_daily(now=None):
+    now = now or datetime.now()
+    run = datetime.combine(now.date(), clock(*DAILY_AT))
+    if run <= now:
+        run += timedelta(days=1)
+    return run.timestamp()
+
+
+def next_monthly(now=None):
+    now = now or datetime.now()
+    first = date(now.year + now.month // 12, now.month % 12 + 1, 1)
+    return datetime.combine(first, clock(*DAILY_AT)).timestamp()
+
+
+def period_of(now=None):
+    return (now or datetime.now()).strftime("%Y-%m")
+
+
+def run_monthly_reset(user_id):
+    # idempotent: the period is claimed and the reset done in one transaction, so a
+    # second run in the same month (another window, a catch-up) changes nothing
+    period = period_of()
+    with transaction():
+        claimed = execute_query("""
+            INSERT INTO scheduled_jobs (job_name, user_id, next_run, last_period)
+            VALUES ('monthly_reset', ?, ?, ?)
+            ON CONFLICT(job_name, user_id) DO UPDATE SET last_period = excluded.last_period
+            WHERE last_period IS NULL OR last_period != excluded.last_period
+        """, (user_id, next_monthly(), period)).rowcount
+        if claimed:
+            reset_commitments_monthly(user_id)
+    return bool(claimed)
+
+
+# name -> (job, when it's next due after a run)
+JOBS = {
+    "commitments": (check_commitments, next_daily),
+    "salary_reminder": (check_salary_reminder, next_daily),
+    "monthly_reset": (run_monthly_reset, next_monthly),
+}
+
+
+class Scheduler:
+    def __init__(self, user_id, jobs=None):
+        self.user_id = user_id
+        self.jobs = jobs or JOBS
+        self.queue = []  # (due, name)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    def load(self):
+        # unknown jobs get a row due now. the monthly reset starts as already done for
+        # this month, otherwise a first start mid-month would mark everything unpaid
+        now = time.time()
+        rows = {r["job_name"]: r for r in fetch_all(
+            "SELECT job_name, next_run FROM scheduled_jobs WHERE user_id = ?", (self.user_id,))}
+        queue = []
+        for name in self.jobs:
+            if name in rows:
+                queue.append((rows[name]["next_run"], name))
+                continue
+            execute_query("""
+                INSERT INTO scheduled_jobs (job_name, user_id, next_run, last_period)
+                VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+            """, (name, self.user_id, now, period_of() if name == "monthly_reset" else None))
+            queue.append((now, name))
+        with self.cond:
+            # keep anything run_now() queued while this was loading
+            self.queue = queue + self.queue
+            heapq.heapify(self.queue)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.loop, daemon=True, name="pennywise-scheduler")
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def run_now(self, *names):
+        # queue jobs ahead of schedule (e.g. after the user adds a commitment)
+        with self.cond:
+            for name in names:
+                if name in self.jobs:
+                    heapq.heappush(self.queue, (0, name))
+            self.cond.notify()
+
+    def loop(self):
+        try:
+            self.load()
+            while True:
+                with self.cond:
+                    while not self.stopped:
+                        wait = self.queue[0][0] - time.time() if self.queue else MAX_SLEEP
+                        if wait <= 0:
+                            break
+                        self.cond.wait(min(wait, MAX_SLEEP))
+                    if self.stopped:
+                        return
+                    _, name = heapq.heappop(self.queue)
+                    # drop duplicates of this job queued by run_now, one run covers them
+                    self.queue = [(due, n) for due, n in self.queue if n != name]
+                    heapq.heapify(self.queue)
+                due = self.run_job(name)
+                with self.cond:
+                    heapq.heappush(self.queue, (due, name))
+        except Exception:
+            traceback.print_exc()
+        finally:
+            close_thread_connection()
+
+    def run_job(self, name):
+        job, next_due = self.jobs[name]
+        try:
+            job(self.user_id)
+            due = next_due()
+        except Exception:
+            print(f"Scheduled job {name} failed:")
+            traceback.print_exc()
+            due = time.time() + RETRY_DELAY
+        execute_query("""
+            UPDATE scheduled_jobs SET next_run = ?, last_run = ?
+            WHERE job_name = ? AND user_id = ?
+        """, (due, time.time(), name, self.user_id))
+        return due
@@ -1,6 +1,9 @@
-from database.db_manager import execute_query,fetch_all,fetch_one
-from core.currency import convert
+from database.db_manager import (
+    execute_query,fetch_all,fetch_one,execute_many,insert_many,transaction
+)
+from core.currency import convert_rows  # also registers the fx() sql function
 from datetime import datetime
+import hashlib
 
 
 def get_user_currency(user_id):
@@ -19,129 +22,425 @@ def add_txn(user_id,acc_id,cat_id,amt,tx_type,note,date,recurring):
     execute_query(q,p,commit=True)
 
 
-def get_all_txns(user_id):
+def add_txns_bulk(user_id,rows,chunk_size=5000):
+    # rows are tuples in add_txn order (acc_id, cat_id, amt, tx_type, note, date, recurring)
+    # or dicts keyed by column name. returns the new transaction ids in order
     q = '''
+    INSERT INTO transactions (
+        user_id, account_id, category_id, amount,
+        transaction_type, description, date, is_recurring
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    def params():
+        for r in rows:
+            if isinstance(r,dict):
+                yield (
+                    user_id,
+                    r.get("account_id"),
+                    r.get("category_id"),
+                    r["amount"],
+                    r["transaction_type"],
+                    r.get("description"),
+                    r.get("date") or datetime.now(),
+                    int(r.get("is_recurring",0))
+                )
+            else:
+                acc_id,cat_id,amt,tx_type,note,date,recurring = r
+                yield (user_id,acc_id,cat_id,amt,tx_type,note,date,int(recurring))
+
+    return insert_many(q,params(),chunk_size)
+
+
+def import_txns(user_id,rows,chunk_size=5000):
+    # like add_txns_bulk for dict rows that carry a fingerprint: rows already present
+    # (same user + fingerprint) are skipped, so importing a file twice adds nothing.
+    # returns how many were new
+    q = '''
+    INSERT INTO transactions (
+        user_id, account_id, category_id, amount, transaction_type,
+        description, date, is_recurring, fingerprint
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+    '''
+    params = (
+        (
+            user_id,
+            r.get("account_id"),
+            r.get("category_id"),
+            r["amount"],
+            r["transaction_type"],
+            r.get("description"),
+            r.get("date") or datetime.now(),
+            int(r.get("is_recurring") or 0),
+            r["fingerprint"]
+        )
+        for r in rows
+    )
+    return execute_many(q,params,chunk_size)
+
+
+class TxnRow:
+    # one transaction with its category/account names. plain attributes instead of
+    # sqlite3.Row so amounts can be converted in place, and __slots__ keeps a long
+    # stream light. supports row["col"] and dict(row) like the rows it replaces
+    __slots__ = (
+        "transaction_id","user_id","account_id","category_id","amount","transaction_type",
+        "description","date","is_recurring","recurrence_pattern","fingerprint",
+        "category_name","bank_name","account_type","account_currency"
+    )
+
+    def __init__(self,transaction_id,user_id,account_id,category_id,amount,transaction_type,
+                 description,date,is_recurring,recurrence_pattern,fingerprint,
+                 category_name,bank_name,account_type,account_currency):
+        # spelled out rather than a setattr loop, this runs once per streamed row
+        self.transaction_id = transaction_id
+        self.user_id = user_id
+        self.account_id = account_id
+        self.category_id = category_id
+        self.amount = amount
+        self.transaction_type = transaction_type
+        self.description = description
+        self.date = date
+        self.is_recurring = is_recurring
+        self.recurrence_pattern = recurrence_pattern
+        self.fingerprint = fingerprint
+        self.category_name = category_name
+        self.bank_name = bank_name
+        self.account_type = account_type
+        self.account_currency = account_currency
+
+    def __getitem__(self,key):
+        try:
+            return getattr(self,key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self,key,default=None):
+        return getattr(self,key,default)
+
+    def keys(self):
+        return self.__slots__
+
+    def __repr__(self):
+        return f"TxnRow({self.transaction_id}, {self.date}, {self.transaction_type}, {self.amount})"
+
+
+TXN_PAGE_SIZE = 1000
+
+
+def _txn_filters(user_id,start=None,end=None,category_id=None,account_id=None,tx_type=None):
+    # where clause shared by iter_txn_pages and count_txns
+    where = "t.user_id = ?"
+    params = [user_id]
+    for clause,value in (
+        ("t.date >= ?",start),
+        ("t.date < ?",end),
+        ("t.category_id = ?",category_id),
+        ("t.account_id = ?",account_id),
+        ("t.transaction_type = ?",tx_type),
+    ):
+        if value is not None:
+            where += f" AND {clause}"
+            params.append(str(value) if clause.startswith("t.date") else value)
+    return where,params
+
+
+def count_txns(user_id,**filters):
+    where,params = _txn_filters(user_id,**filters)
+    return fetch_one(f"SELECT COUNT(*) AS n FROM transactions t WHERE {where}",params)["n"]
+
+
+def iter_txn_pages(user_id,start=None,end=None,category_id=None,account_id=None,tx_type=None,
+                   page_size=TXN_PAGE_SIZE,convert=True):
+    # newest first, one list of TxnRow per page. keyset pagination on (date, transaction_id)
+    # walks idx_transactions_user_date, so every page costs the same however deep it is.
+    # start is inclusive, end exclusive. convert=True puts amounts in the user's currency.
+    # rows without a date sort last and get their own branch, a row value comparison
+    # with NULL is never true
+    where,params = _txn_filters(user_id,start,end,category_id,account_id,tx_type)
+    q = f'''
     SELECT 
-        t.*, 
+        t.transaction_id, t.user_id, t.account_id, t.category_id, t.amount,
+        t.transaction_type, t.description, t.date, t.is_recurring,
+        t.recurrence_pattern, t.fingerprint,
         c.category_name, 
         a.bank_name,
-        a.account_type
+        a.account_type,
+        a.currency AS account_currency
     FROM transactions t
     LEFT JOIN categories c ON t.category_id = c.category_id
-    LEFT JOIN accounts a ON t.account_id = a.account_id
-    WHERE t.user_id = ?
-    ORDER BY t.date DESC
+    LEFT JOIN accounts a ON t.account_id = a.account_id AND a.user_id = t.user_id
+    WHERE {where}
     '''
-    txns = fetch_all(q,(user_id,))
 
+    user_currency = get_user_currency(user_id) if convert else None
+    last = None
+    while True:
+        page_q = q
+        page_params = list(params)
+        if last is not None and last[0] is None:
+            page_q += " AND t.date IS NULL AND t.transaction_id < ?"
+            page_params.append(last[1])
+        elif last is not None:
+            page_q += " AND ((t.date, t.transaction_id) < (?, ?) OR t.date IS NULL)"
+            page_params += last
+        page_q += " ORDER BY t.date DESC, t.transaction_id DESC LIMIT ?"
+        page_params.append(page_size)
 
-    user_currency = get_user_currency(user_id)
-    if user_currency != "USD":
-        for txn in txns:
-            txn["amount"] = convert(txn["amount"],"USD",user_currency) or txn["amount"]
+        page = [TxnRow(*r) for r in fetch_all(page_q,page_params)]
+        if not page:
+            return
 
-    return txns
+        if convert:
+            currencies = [t.account_currency or "USD" for t in page]
+            if any(c != user_currency for c in currencies):
+                amounts = convert_rows([t.amount for t in page],currencies,user_currency)
+                for txn,amt in zip(page,amounts):
+                    txn.amount = float(amt)
 
+        yield page
+        if len(page) < page_size:
+            return
+        last = [page[-1].date,page[-1].transaction_id]
+
+
+def iter_txns(user_id,**filters):
+    # same arguments as iter_txn_pages, one TxnRow at a time
+    for page in iter_txn_pages(user_id,**filters):
+        yield from page
+
+
+def get_all_txns(user_id,**filters):
+    return list(iter_txns(user_id,**filters))
+
+
+def _needs_fx(user_id,to_curr):
+    # true if any of the user's money sits in another currency. transactions without
+    # a known account count as USD, same as the fx() queries. O(accounts)
+    row = fetch_one("""
+        SELECT 1 FROM account_balance b
+        LEFT JOIN accounts a ON b.account_id = a.account_id AND a.user_id = b.user_id
+        WHERE b.user_id = ? AND b.txn_count > 0 AND COALESCE(a.currency, 'USD') != ?
+        LIMIT 1
+    """,(user_id,to_curr))
+    return row is not None
+
+
+def get_total_by_type(user_id,to_curr=None):
+    # with to_curr every amount is converted at the rate on its own date (fx() sql function).
+    # when nothing needs converting the category_spend aggregate answers it directly
+    if to_curr and _needs_fx(user_id,to_curr):
+        q = '''
+        SELECT 
+            t.transaction_type, 
+            SUM(fx(t.amount, COALESCE(a.currency, 'USD'), t.date, ?)) as total
+        FROM transactions t
+        LEFT JOIN accounts a ON t.account_id = a.account_id AND a.user_id = t.user_id
+        WHERE t.user_id = ?
+        GROUP BY t.transaction_type
+        '''
+        return fetch_all(q,(to_curr,user_id))
 
-def get_total_by_type(user_id):
     q = '''
     SELECT 
         transaction_type, 
-        SUM(amount) as total
-    FROM transactions
-    WHERE user_id = ?
+        SUM(total) as total
+    FROM category_spend
+    WHERE user_id = ? AND txn_count > 0
     GROUP BY transaction_type
     '''
     return fetch_all(q,(user_id,))
 
 
-def get_txn_summary_by_cat(user_id):
+def get_txn_summary_by_cat(user_id,to_curr=None):
+    if to_curr and _needs_fx(user_id,to_curr):
+        q = '''
+        SELECT 
+            c.category_name, 
+            SUM(fx(t.amount, COALESCE(a.currency, 'USD'), t.date, ?)) as total,
+            c.color
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        LEFT JOIN accounts a ON t.account_id = a.account_id AND a.user_id = t.user_id
+        WHERE t.user_id = ? AND t.transaction_type = 'expense'
+        GROUP BY c.category_name
+        ORDER BY total DESC
+        '''
+        return fetch_all(q,(to_curr,user_id))
+
     q = '''
     SELECT 
         c.category_name, 
-        SUM(t.amount) as total,
+        SUM(s.total) as total,
         c.color
-    FROM transactions t
-    JOIN categories c ON t.category_id = c.category_id
-    WHERE t.user_id = ? AND t.transaction_type = 'expense'
+    FROM category_spend s
+    JOIN categories c ON s.category_id = c.category_id
+    WHERE s.user_id = ? AND s.transaction_type = 'expense' AND s.txn_count > 0
     GROUP BY c.category_name
     ORDER BY total DESC
     '''
     return fetch_all(q,(user_id,))
 
 
-def insert_plaid_transaction(user_id,account_id,txn):
-    #  if transaction already exists
-    existing = fetch_one('''
-        SELECT transaction_id FROM transactions 
-        WHERE user_id = ? AND amount = ? AND date = ? AND description = ?
-    ''',(user_id,abs(txn["amount"]),txn["date"],txn.get("name","")))
-
-    if existing:
-        return False  #  duplicates
-
-    # transaction type (Plaid uses positive for expenses)
-    amount = abs(txn["amount"])
-    txn_type = "expense" if txn["amount"] > 0 else "income"
-
-    #  create category
-    category_id = None
-    if "category" in txn:
-        category_path = " > ".join(txn["category"]) if isinstance(txn.get("category"), list) else "Uncategorized"
-        category = fetch_one('''
-            SELECT category_id FROM categories 
-            WHERE user_id = ? AND category_name = ?
-        ''',(user_id,category_path))
-
-        if not category:
-            execute_query('''
-                INSERT INTO categories (user_id, category_name)
-                VALUES (?, ?)
-            ''',(user_id,category_path),commit=True)
-            category_id = execute_query("SELECT last_insert_rowid()").fetchone()[0]
-        else:
-            category_id = category["category_id"]
-
-    #  transaction
-    q = '''
-    INSERT INTO transactions (
-        user_id, account_id, category_id, amount,
-        transaction_type, description, date, is_recurring
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    '''
-    execute_query(q,(
-        user_id,
-        account_id,
-        category_id,
-        amount,
-        txn_type,
-        txn.get("name","Plaid Transaction"),
-        txn.get("date",datetime.now().date().isoformat()),
-        0  # is_recurring
-    ),commit=True)
+def plaid_fingerprint(txn):
+    # plaid's transaction_id is stable across fetches. without one fall back to the
+    # fields we used to dedup on
+    if txn.get("transaction_id"):
+        key = f"plaid:{txn['transaction_id']}"
+    else:
+        key = f"{txn.get('account_id')}|{abs(txn['amount'])}|{txn.get('date')}|{txn.get('name','')}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def plaid_category_path(txn):
+    if "category" not in txn:
+        return None
+    return " > ".join(txn["category"]) if isinstance(txn.get("category"),list) else "Uncategorized"
+
+
+def resolve_categories(user_id,names):
+    # name -> category_id for every name, creating the missing ones. one select + one batch insert
+    names = sorted({n for n in names if n})
+    if not names:
+        return {}
+
+    marks = ",".join("?" * len(names))
+    rows = fetch_all(f'''
+        SELECT category_name, category_id FROM categories
+        WHERE user_id = ? AND category_name IN ({marks})
+    ''',(user_id,*names))
+    found = {r["category_name"]: r["category_id"] for r in rows}
+
+    missing = [n for n in names if n not in found]
+    if missing:
+        ids = insert_many(
+            "INSERT INTO categories (user_id, category_name) VALUES (?, ?)",
+            [(user_id,n) for n in missing]
+        )
+        found.update(zip(missing,ids))
+    return found
+
+
+def ingest_plaid_transactions(user_id,txns,account_id=None):
+    # set based plaid import: fingerprint every row, resolve all categories at once
+    # and upsert the batch, skipping rows we already have. returns how many were new
+    txns = list(txns)
+    if not txns:
+        return 0
+
+    with transaction():
+        fingerprints = [plaid_fingerprint(t) for t in txns]
+        legacy = _match_legacy_rows(user_id,txns,fingerprints)
+        categories = resolve_categories(user_id,[plaid_category_path(t) for t in txns])
+
+        rows = []
+        for txn,fp in zip(txns,fingerprints):
+            if fp in legacy:
+                continue
+            rows.append((
+                user_id,
+                account_id or txn.get("account_id"),
+                categories.get(plaid_category_path(txn)),
+                abs(txn["amount"]),
+                # plaid uses positive amounts for money going out
+                "expense" if txn["amount"] > 0 else "income",
+                txn.get("name","Plaid Transaction"),
+                txn.get("date",datetime.now().date().isoformat()),
+                0,  # is_recurring
+                fp
+            ))
+
+        return execute_many('''
+            INSERT INTO transactions (
+                user_id, account_id, category_id, amount,
+                transaction_type, description, date, is_recurring, fingerprint
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        ''',rows)
 
-    return True
+
+def _match_legacy_rows(user_id,txns,fingerprints):
+    # rows imported before fingerprints existed have none, so match them the old way
+    # (amount, date, name) in one range query and stamp their fingerprint for next time
+    dates = [t["date"] for t in txns if t.get("date")]
+    if not dates:
+        return set()
+
+    rows = fetch_all('''
+        SELECT transaction_id, amount, date, description FROM transactions
+        WHERE user_id = ? AND fingerprint IS NULL AND date BETWEEN ? AND ?
+    ''',(user_id,min(dates),max(dates)))
+    if not rows:
+        return set()
+
+    by_key = {(r["amount"],str(r["date"]),r["description"]): r["transaction_id"] for r in rows}
+    matched = set()
+    stamps = []
+    for txn,fp in zip(txns,fingerprints):
+        txn_id = by_key.pop((abs(txn["amount"]),txn.get("date"),txn.get("name","")),None)
+        if txn_id is not None:
+            matched.add(fp)
+            stamps.append((fp,txn_id))
+
+    if stamps:
+        execute_many("UPDATE OR IGNORE transactions SET fingerprint = ? WHERE transaction_id = ?",stamps)
+    return matched
+
+
+def update_plaid_transactions(user_id,txns):
+    # plaid "modified" rows, matched on their fingerprint. returns how many changed
+    txns = list(txns)
+    if not txns:
+        return 0
+
+    with transaction():
+        categories = resolve_categories(user_id,[plaid_category_path(t) for t in txns])
+        rows = [(
+            categories.get(plaid_category_path(t)),
+            abs(t["amount"]),
+            "expense" if t["amount"] > 0 else "income",
+            t.get("name","Plaid Transaction"),
+            t.get("date"),
+            user_id,
+            plaid_fingerprint(t)
+        ) for t in txns]
+
+        return execute_many('''
+            UPDATE transactions
+            SET category_id = ?, amount = ?, transaction_type = ?, description = ?,
+                date = COALESCE(?, date)
+            WHERE user_id = ? AND fingerprint = ?
+        ''',rows)
+
+
+def remove_plaid_transactions(user_id,removed):
+    # plaid "removed" entries only carry the transaction_id
+    rows = [(user_id,plaid_fingerprint(r)) for r in removed if r.get("transaction_id")]
+    if not rows:
+        return 0
+    return execute_many("DELETE FROM transactions WHERE user_id = ? AND fingerprint = ?",rows)
+
+
+def insert_plaid_transaction(user_id,account_id,txn):
+    return ingest_plaid_transactions(user_id,[txn],account_id) > 0
 
 
 def get_account_balance(user_id,account_type="salary"):
     q = '''
     SELECT 
-        SUM(CASE WHEN t.transaction_type = 'income' THEN t.amount ELSE 0 END) as total_income,
-        SUM(CASE WHEN t.transaction_type = 'expense' THEN t.amount ELSE 0 END) as total_expenses
-    FROM transactions t
-    JOIN accounts a ON t.account_id = a.account_id
-    WHERE t.user_id = ? AND a.account_type = ?
+        a.currency,
+        SUM(b.balance) as balance
+    FROM account_balance b
+    JOIN accounts a ON b.account_id = a.account_id AND a.user_id = b.user_id
+    WHERE b.user_id = ? AND a.account_type = ? AND b.txn_count > 0
+    GROUP BY a.currency
     '''
-    result = fetch_one(q,(user_id,account_type))
+    rows = fetch_all(q,(user_id,account_type))
+    if not rows:
+        return 0
 
-    if result:
-        balance = (result["total_income"] or 0) - (result["total_expenses"] or 0)
-
-        # convert to user's currency if needed
-        user_currency = get_user_currency(user_id)
-        if user_currency != "USD":
-            balance = convert(balance,"USD",user_currency) or balance
-
-        return balance
-
-    return 0
+    # one balance per account currency, converted to the user's currency together
+    balances = [r["balance"] or 0 for r in rows]
+    user_currency = get_user_currency(user_id)
+    return float(convert_rows(balances,[r["currency"] for r in rows],user_currency).sum())
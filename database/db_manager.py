@@ -1,33 +1,216 @@
 import sqlite3
 import os
+import threading
+import atexit
+from contextlib import contextmanager
+
+from database.migrations import migrate
 
 DB_PATH = "pennywise.db"
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
 
+# one connection per thread, reused for every query on that thread.
+# a sqlite connection must not be used by two threads at once, so the qt thread,
+# the flask callback thread and any worker each get their own.
+_local = threading.local()
+_pool = {}
+_pool_lock = threading.Lock()
+
+# sql functions added with register_function(), installed on every connection
+_functions = {}
+
+# performance profile applied to every new connection, change it with configure_db().
+# WAL lets the plaid/flask thread write while the qt thread reads the dashboard.
+DB_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",      # safe with WAL, only the last commits can be lost on power cut
+    "mmap_size": 64 * 1024 * 1024,
+    "cache_size": -16000,         # negative = KiB, so ~16MB page cache per connection
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,         # ms to wait on a locked db before giving up
+    "wal_autocheckpoint": 1000,   # pages; sqlite checkpoints the wal once it grows past this
+}
+
+
+def configure_db(**profile):
+    unknown = set(profile) - set(DB_PROFILE)
+    if unknown:
+        raise ValueError(f"unknown db settings: {', '.join(sorted(unknown))}")
+    DB_PROFILE.update(profile)
+
+    # meant to be called at startup; only this thread's existing connection is updated in place
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        apply_profile(conn)
+
+
+def apply_profile(conn):
+    for name, value in DB_PROFILE.items():
+        if value is not None:
+            conn.execute(f"PRAGMA {name} = {value}")
+
 
-def connect_db():
-    conn = sqlite3.connect(DB_PATH)
+def connect_db(check_same_thread=True):
+    timeout = (DB_PROFILE.get("busy_timeout") or 5000) / 1000
+    conn = sqlite3.connect(DB_PATH, timeout=timeout, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
+    apply_profile(conn)
+    for (name, nargs), func in _functions.items():
+        conn.create_function(name, nargs, func)
     return conn
 
 
-def initialize_db():
+def register_function(name, nargs, func):
+    # makes a python function callable from sql, e.g. SUM(fx(amount, ...)).
+    # connections opened before this pick it up the next time their thread asks for one
+    _functions[(name, nargs)] = func
+
+
+def checkpoint(mode="PASSIVE"):
+    # for after big imports. PASSIVE never blocks readers/writers, FULL/RESTART/TRUNCATE wait for them
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"bad checkpoint mode: {mode}")
+    return get_conn().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+def get_conn():
+    conn = getattr(_local, "conn", None)
+    # reopen if DB_PATH was changed after this thread connected
+    if conn is not None and _local.path == DB_PATH:
+        if _local.functions != len(_functions):
+            for (name, nargs), func in _functions.items():
+                conn.create_function(name, nargs, func)
+            _local.functions = len(_functions)
+        return conn
+    if conn is not None:
+        close_thread_connection()
+
+    conn = connect_db(check_same_thread=False)
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.functions = len(_functions)
+    with _pool_lock:
+        _pool[threading.get_ident()] = conn
+    return conn
+
+
+def close_thread_connection():
+    # call when a short-lived thread (e.g. a flask request) is done with the db
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    with _pool_lock:
+        _pool.pop(threading.get_ident(), None)
+    _local.conn = None
+    conn.close()
+
+
+def close_all_connections():
+    # shutdown only: pooled connections skip sqlite's same-thread check so they
+    # can be closed from here, but they are never used by two threads at once
+    with _pool_lock:
+        conns = list(_pool.values())
+        _pool.clear()
+    # sqlite checkpoints and removes the -wal file when the last connection closes
+    for conn in conns:
+        conn.close()
+    _local.conn = None
+
+
+atexit.register(close_all_connections)
+
+
+def initialize_db(**profile):
+    if profile:
+        configure_db(**profile)
+
     if not os.path.exists(DB_PATH):
-        with connect_db() as conn:
+        conn = get_conn()
+        with conn:
             with open(SCHEMA_PATH, "r") as f:
                 conn.executescript(f.read())
         print(" Database initialized.")
     else:
         print("Database already exists.")
 
+    # older databases only had the base schema, bring them up to date
+    applied = migrate(get_conn())
+    if applied:
+        print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+
+
+@contextmanager
+def transaction():
+    # groups every query made on this thread inside the block into one commit.
+    # nested blocks join the outer one
+    conn = get_conn()
+    depth = getattr(_local, "depth", 0)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        if depth == 0:
+            conn.rollback()
+        raise
+    _local.depth = depth
+    if depth == 0:
+        conn.commit()
+
+
+def in_transaction():
+    return getattr(_local, "depth", 0) > 0
+
 
 def execute_query(query, params=(), commit=False):
-    with connect_db() as conn:
+    conn = get_conn()
+    if in_transaction():
+        return conn.execute(query, params)
+
+    # the connection context manager commits on success and rolls back on error,
+    # same as before when every query opened its own connection
+    with conn:
         cursor = conn.cursor()
         cursor.execute(query, params)
-        if commit:
-            conn.commit()
-        return cursor
+    return cursor
+
+
+def _run_chunks(query, rows, chunk_size):
+    # yields (cursor, chunk) with every chunk committed on its own, so a big
+    # import doesn't hold the write lock (or grow the wal) for the whole run
+    rows = iter(rows)
+    while True:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                break
+        if not chunk:
+            return
+        with transaction() as conn:
+            cursor = conn.executemany(query, chunk)
+            yield cursor, chunk
+
+
+def execute_many(query, rows, chunk_size=5000):
+    # returns how many rows were changed
+    total = 0
+    for cursor, _ in _run_chunks(query, rows, chunk_size):
+        total += cursor.rowcount
+    return total
+
+
+def insert_many(query, rows, chunk_size=5000):
+    # like execute_many but returns the new rowids. only valid for plain INSERTs
+    # (no OR IGNORE / ON CONFLICT): inside the write lock sqlite hands out
+    # rowids one after another, so each chunk's ids end at last_insert_rowid()
+    ids = []
+    for cursor, chunk in _run_chunks(query, rows, chunk_size):
+        last = cursor.connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+        ids.extend(range(last - len(chunk) + 1, last + 1))
+    return ids
 
 
 def fetch_all(query, params=()):
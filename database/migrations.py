@@ -0,0 +1,232 @@
+import sqlite3
+
+# ordered schema changes, applied by initialize_db() on every start.
+# each one runs once per database and is recorded in schema_version.
+# never edit a migration that has shipped, add a new one at the end.
+# a migration is either a sql script or a function taking the connection.
+MIGRATIONS = [
+    (1, "hot path indexes on transactions", """
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+            ON transactions(user_id, date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_cat_type
+            ON transactions(user_id, category_id, transaction_type);
+        CREATE INDEX IF NOT EXISTS idx_transactions_account
+            ON transactions(account_id);
+    """),
+    (2, "per-user lookup indexes", """
+        CREATE INDEX IF NOT EXISTS idx_categories_user
+            ON categories(user_id);
+        CREATE INDEX IF NOT EXISTS idx_accounts_user
+            ON accounts(user_id);
+        CREATE INDEX IF NOT EXISTS idx_ai_suggestions_user_time
+            ON ai_suggestions(user_id, generated_at);
+        CREATE INDEX IF NOT EXISTS idx_commitments_user
+            ON category_commitments(user_id);
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_type
+            ON notifications(user_id, notification_type, created_at);
+    """),
+    (3, "plaid dedup fingerprint", """
+        ALTER TABLE transactions ADD COLUMN fingerprint TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_fingerprint
+            ON transactions(user_id, fingerprint);
+    """),
+    (4, "plaid sync cursors", """
+        CREATE TABLE IF NOT EXISTS plaid_items (
+            plaid_token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            sync_cursor TEXT,
+            last_sync TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        );
+    """),
+    (5, "exchange rate cache", """
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            base TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            rate REAL NOT NULL,
+            fetched_at REAL NOT NULL,  -- unix time
+            PRIMARY KEY (base, quote)
+        );
+    """),
+    (6, "historical exchange rates", """
+        CREATE TABLE IF NOT EXISTS fx_history (
+            base TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            date TEXT NOT NULL,  -- YYYY-MM-DD
+            rate REAL NOT NULL,
+            PRIMARY KEY (base, quote, date)
+        );
+    """),
+    (7, "llm response cache", """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,  -- unix time
+            last_hit REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_last_hit ON llm_cache(last_hit);
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at);
+    """),
+    (8, "notification dedup", """
+        ALTER TABLE ai_suggestions ADD COLUMN content_hash TEXT;
+        ALTER TABLE ai_suggestions ADD COLUMN notify_day TEXT;  -- YYYY-MM-DD
+        -- rows without a hash (ai tips, one-off notes) never collide, NULLs are distinct
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_suggestions_dedup
+            ON ai_suggestions(user_id, content_hash, notify_day);
+    """),
+    (9, "background job schedule", """
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            job_name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            next_run REAL NOT NULL,  -- unix time
+            last_run REAL,
+            last_period TEXT,        -- YYYY-MM of the last monthly run
+            PRIMARY KEY (job_name, user_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        );
+    """),
+    (10, "spend and balance aggregates", """
+        -- running totals kept by the triggers below, so the dashboard reads one row
+        -- per category/account instead of summing transactions. category 0 = none,
+        -- account '' = none. core/aggregates.py rebuilds and verifies them
+        CREATE TABLE IF NOT EXISTS category_spend (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            period TEXT NOT NULL,  -- YYYY-MM
+            total REAL NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id, transaction_type, period)
+        );
+        CREATE TABLE IF NOT EXISTS account_balance (
+            user_id INTEGER NOT NULL,
+            account_id INTEGER NOT NULL,  -- same affinity as transactions.account_id
+            balance REAL NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, account_id)
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO category_spend (user_id, category_id, transaction_type, period, total, txn_count)
+            VALUES (NEW.user_id, IFNULL(NEW.category_id, 0), NEW.transaction_type,
+                    IFNULL(strftime('%Y-%m', NEW.date), ''), NEW.amount, 1)
+            ON CONFLICT(user_id, category_id, transaction_type, period) DO UPDATE SET
+                total = total + excluded.total, txn_count = txn_count + 1;
+            INSERT INTO account_balance (user_id, account_id, balance, txn_count)
+            VALUES (NEW.user_id, IFNULL(NEW.account_id, ''),
+                    CASE WHEN NEW.transaction_type = 'income' THEN NEW.amount ELSE -NEW.amount END, 1)
+            ON CONFLICT(user_id, account_id) DO UPDATE SET
+                balance = balance + excluded.balance, txn_count = txn_count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            UPDATE category_spend SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id AND category_id = IFNULL(OLD.category_id, 0)
+              AND transaction_type = OLD.transaction_type
+              AND period = IFNULL(strftime('%Y-%m', OLD.date), '');
+            UPDATE account_balance
+            SET balance = balance - CASE WHEN OLD.transaction_type = 'income' THEN OLD.amount ELSE -OLD.amount END,
+                txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id AND account_id = IFNULL(OLD.account_id, '');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_update
+        AFTER UPDATE OF user_id, account_id, category_id, amount, transaction_type, date ON transactions
+        BEGIN
+            UPDATE category_spend SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id AND category_id = IFNULL(OLD.category_id, 0)
+              AND transaction_type = OLD.transaction_type
+              AND period = IFNULL(strftime('%Y-%m', OLD.date), '');
+            UPDATE account_balance
+            SET balance = balance - CASE WHEN OLD.transaction_type = 'income' THEN OLD.amount ELSE -OLD.amount END,
+                txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id AND account_id = IFNULL(OLD.account_id, '');
+            INSERT INTO category_spend (user_id, category_id, transaction_type, period, total, txn_count)
+            VALUES (NEW.user_id, IFNULL(NEW.category_id, 0), NEW.transaction_type,
+                    IFNULL(strftime('%Y-%m', NEW.date), ''), NEW.amount, 1)
+            ON CONFLICT(user_id, category_id, transaction_type, period) DO UPDATE SET
+                total = total + excluded.total, txn_count = txn_count + 1;
+            INSERT INTO account_balance (user_id, account_id, balance, txn_count)
+            VALUES (NEW.user_id, IFNULL(NEW.account_id, ''),
+                    CASE WHEN NEW.transaction_type = 'income' THEN NEW.amount ELSE -NEW.amount END, 1)
+            ON CONFLICT(user_id, account_id) DO UPDATE SET
+                balance = balance + excluded.balance, txn_count = txn_count + 1;
+        END;
+
+        -- backfill from what's already there
+        INSERT INTO category_spend (user_id, category_id, transaction_type, period, total, txn_count)
+        SELECT user_id, IFNULL(category_id, 0), transaction_type, IFNULL(strftime('%Y-%m', date), ''),
+               SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3, 4;
+        INSERT INTO account_balance (user_id, account_id, balance, txn_count)
+        SELECT user_id, IFNULL(account_id, ''),
+               SUM(CASE WHEN transaction_type = 'income' THEN amount ELSE -amount END), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2;
+    """),
+    (11, "budget periods", """
+        ALTER TABLE categories ADD COLUMN budget_period TEXT DEFAULT 'monthly';  -- monthly / weekly
+        ALTER TABLE categories ADD COLUMN budget_rollover TEXT DEFAULT 'none';   -- none / unused / all
+        -- period spend is a range scan on this, the last two columns make it covering
+        CREATE INDEX IF NOT EXISTS idx_transactions_spend
+            ON transactions(user_id, transaction_type, date, category_id, amount);
+    """),
+    (12, "one accounts row per plaid account", """
+        -- the old INSERT OR REPLACE had no key to replace on, so every re-link added
+        -- another row per account and joins on account_id fanned out. keep the newest
+        DELETE FROM accounts WHERE id NOT IN (
+            SELECT MAX(id) FROM accounts GROUP BY user_id, account_id
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_user_account
+            ON accounts(user_id, account_id);
+        -- covered by the unique index
+        DROP INDEX IF EXISTS idx_accounts_user;
+    """),
+]
+
+
+def current_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    version = current_version(conn)
+    applied = []
+
+    for num, name, step in MIGRATIONS:
+        if num <= version:
+            continue
+        try:
+            # explicit BEGIN so ddl is rolled back too. executescript commits whatever
+            # is pending first, so sql steps carry their own BEGIN/COMMIT
+            if callable(step):
+                conn.execute("BEGIN")
+                step(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (num, name))
+                conn.commit()
+            else:
+                label = name.replace("'", "''")
+                conn.executescript(
+                    "BEGIN;\n" + step +
+                    f"\nINSERT INTO schema_version (version, name) VALUES ({num}, '{label}');\nCOMMIT;"
+                )
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(num)
+
+    return applied
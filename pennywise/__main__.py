@@ -0,0 +1,207 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+# headless entry point for scripts and nightly jobs: python -m pennywise <command> ...
+# only core/ and database/ are imported here, never PyQt5, matplotlib or flask, and
+# each command imports what it needs so startup stays fast
+
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "pdf": ".pdf",
+}
+
+
+def _date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {text}") from None
+
+
+def _filters(args):
+    # --to is inclusive on the command line, the query bound is exclusive
+    filters = {}
+    if args.date_from:
+        filters["start"] = args.date_from
+    if args.date_to:
+        filters["end"] = args.date_to + timedelta(days=1)
+    if getattr(args, "category", None) is not None:
+        filters["category_id"] = args.category
+    if getattr(args, "type", None):
+        filters["tx_type"] = args.type
+    return filters
+
+
+def _progress(args):
+    if args.quiet:
+        return None
+    last = [0.0]
+
+    def report(done, total):
+        now = time.monotonic()
+        if done == total or now - last[0] > 0.5:
+            last[0] = now
+            print(f"\r{done}/{total}", end="\n" if done == total else "", file=sys.stderr, flush=True)
+    return report
+
+
+def _format_of(path):
+    for fmt, suffix in sorted(EXPORT_FORMATS.items(), key=lambda i: -len(i[1])):
+        if path.endswith(suffix):
+            return fmt
+    return None
+
+
+def cmd_export(args):
+    # the writers pick the container from the file suffix, so --out has to end in a
+    # known one. --format is only needed without --out, and must agree with it
+    if args.out:
+        fmt = _format_of(args.out)
+        if fmt is None:
+            print(f"--out must end in one of {', '.join(EXPORT_FORMATS.values())}", file=sys.stderr)
+            return False
+        if args.format and args.format != fmt:
+            print(f"--format {args.format} doesn't match {args.out}, which is {fmt}", file=sys.stderr)
+            return False
+        out = args.out
+    else:
+        fmt = args.format or "csv"
+        out = f"transactions_{args.user}{EXPORT_FORMATS[fmt]}"
+
+    if fmt == "pdf":
+        from core.report import write_pdf_report as writer
+        kwargs = {}
+    elif fmt in ("parquet", "arrow"):
+        from core.exporter import write_arrow as writer
+        kwargs = {}
+    else:
+        from core.exporter import write_csv as writer
+        kwargs = {"compress": fmt == "csv.gz"}
+
+    ok, msg = writer(args.user, out, progress=_progress(args), **kwargs, **_filters(args))
+    print(f"{out}: {msg}")
+    return ok
+
+
+def cmd_import(args):
+    if not args.path.endswith((".parquet", ".arrow", ".feather")):
+        print("only .parquet / .arrow files can be imported", file=sys.stderr)
+        return False
+    from core.exporter import read_arrow
+    ok, msg = read_arrow(args.user, args.path, progress=_progress(args))
+    print(msg)
+    return ok
+
+
+def cmd_aggregates(args):
+    from core.aggregates import rebuild_aggregates, verify_aggregates
+    if args.action == "rebuild":
+        rebuild_aggregates(args.user)
+        print("aggregates rebuilt")
+        return True
+
+    bad = verify_aggregates(args.user)
+    for table, key, have, want in bad:
+        print(f"{table} {key}: stored {have}, actual {want}")
+    print(f"{len(bad)} mismatches")
+    return not bad
+
+
+def cmd_suggest(args):
+    from core.ai_suggestions import collect_findings, generate_suggestions, rank_local_tips
+    findings = collect_findings(args.user)
+    if args.local:
+        tips = rank_local_tips(findings)
+    else:
+        tips = generate_suggestions(args.user, findings=findings)
+    for tip in tips:
+        print(f"- {tip}")
+    if not tips:
+        print("nothing to suggest")
+    return True
+
+
+def cmd_sync(args):
+    from core.plaid_sync import linked_tokens, refresh_items
+    tokens = linked_tokens(args.user)
+    if not tokens:
+        print("no linked bank items")
+        return True
+
+    result = refresh_items(args.user, tokens, args.workers, progress=_progress(args))
+    synced = result["synced"]
+    print(f"{len(tokens)} items: {synced['added']} added, {synced['modified']} modified, "
+          f"{synced['removed']} removed")
+    for token, error in result["errors"].items():
+        print(f"error {token[:12]}...: {error}", file=sys.stderr)
+    return not result["errors"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m pennywise", description="PennyWise batch commands")
+    parser.add_argument("--db", help="database file (default: pennywise.db in the current directory)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def date_range(p):
+        p.add_argument("--from", dest="date_from", type=_date, help="first day, YYYY-MM-DD")
+        p.add_argument("--to", dest="date_to", type=_date, help="last day (inclusive), YYYY-MM-DD")
+
+    p = commands.add_parser("export", help="export transactions")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("--format", choices=sorted(EXPORT_FORMATS), help="default: from --out, else csv")
+    p.add_argument("--out", help="output file, its suffix sets the format (default: transactions_<user>.<format>)")
+    p.add_argument("--category", type=int, help="category id")
+    p.add_argument("--type", choices=["income", "expense"])
+    date_range(p)
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("import", help="import a parquet/arrow export")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("path")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("aggregates", help="verify or rebuild the spend/balance aggregates")
+    p.add_argument("action", choices=["verify", "rebuild"])
+    p.add_argument("--user", type=int, help="default: every user")
+    p.set_defaults(func=cmd_aggregates)
+
+    p = commands.add_parser("suggest", help="generate budget tips")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("--local", action="store_true", help="rule based tips only, no llm call")
+    p.set_defaults(func=cmd_suggest)
+
+    p = commands.add_parser("sync", help="pull new transactions for every linked bank item")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(func=cmd_sync)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from database import db_manager
+    if args.db:
+        # a typo shouldn't quietly create an empty database
+        if not os.path.exists(args.db):
+            print(f"no database at {args.db}", file=sys.stderr)
+            return 1
+        db_manager.DB_PATH = args.db
+    # initialize_db reports what it did on stdout, keep that out of piped output
+    with contextlib.redirect_stdout(sys.stderr):
+        db_manager.initialize_db()
+
+    return 0 if args.func(args) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the repo root has no packaging, make core/ and database/ importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_manager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # a fresh, fully migrated database file per test
+    db_manager.close_all_connections()
+    monkeypatch.setattr(db_manager, "DB_PATH", str(tmp_path / "pennywise.db"))
+    db_manager.initialize_db()
+    yield db_manager
+    db_manager.close_all_connections()
+
+
+@pytest.fixture
+def user(db):
+    # a bare user 1, no settings, categories or accounts
+    db.execute_query("INSERT INTO users (user_id, email, username, password_hash, role) "
+                     "VALUES (1, 'a@example.com', 'a', 'x', 'End User')")
+    return 1
+
+
+def seed_user(db, user_id, txns=500, seed=1):
+    # a user with settings, 5 categories, a salary and a savings account and
+    # `txns` transactions spread over 2024-2025
+    db.execute_query(
+        "INSERT INTO users (user_id, email, username, password_hash, role) VALUES (?, ?, ?, 'x', 'End User')",
+        (user_id, f"u{user_id}@example.com", f"user{user_id}"))
+    db.execute_query("INSERT INTO settings (user_id, currency) VALUES (?, 'USD')", (user_id,))
+    cats = [db.execute_query(
+        "INSERT INTO categories (user_id, category_name, budget_amount) VALUES (?, ?, 100)",
+        (user_id, f"cat{i}")).lastrowid for i in range(5)]
+    accounts = [f"acc{user_id}_salary", f"acc{user_id}_savings"]
+    db.execute_query("""
+        INSERT INTO accounts (user_id, account_id, account_type, bank_name, currency)
+        VALUES (?, ?, 'salary', 'Bank', 'USD'), (?, ?, 'savings', 'Bank', 'USD')
+    """, (user_id, accounts[0], user_id, accounts[1]))
+
+    from core.transactions import add_txns_bulk
+    rng = random.Random(seed)
+    add_txns_bulk(user_id, [(
+        rng.choice(accounts),
+        rng.choice(cats),
+        round(rng.uniform(1, 200), 2),
+        rng.choice(["income", "expense", "expense"]),
+        "seed",
+        f"{rng.choice([2024, 2025])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        0
+    ) for _ in range(txns)])
+    return {"categories": cats, "accounts": accounts}
@@ -0,0 +1,135 @@
+import sys
+import threading
+import uuid
+from datetime import date, timedelta
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+# a local stand-in for the plaid endpoints core/plaid_api.py calls, serving fixed
+# fixtures through a paginated /transactions/sync so sync can be tested offline.
+# for manual testing run it with
+#   python tests/mock_plaid_server.py [port]
+# and start the app with PLAID_BASE_URL=http://127.0.0.1:<port>
+
+ACCESS_TOKEN = "access-mock-0001"
+PAGE_SIZE = 10
+
+
+def fixture_accounts():
+    return [
+        {"account_id": "mock_checking", "name": "Mock Checking", "type": "depository", "subtype": "checking",
+         "balances": {"available": 1200.5, "current": 1250.0, "iso_currency_code": "USD"}},
+        {"account_id": "mock_savings", "name": "Mock Savings", "type": "depository", "subtype": "savings",
+         "balances": {"available": 5300.0, "current": 5300.0, "iso_currency_code": "USD"}},
+    ]
+
+
+def fixture_transaction(i, **changes):
+    # plaid amounts are positive for money going out
+    txn = {
+        "transaction_id": f"mock_txn_{i:04d}",
+        "account_id": "mock_checking",
+        "amount": -2500.0 if i % 10 == 0 else round(4.99 + (i * 37) % 120, 2),
+        "date": (date(2025, 1, 1) + timedelta(days=i)).isoformat(),
+        "name": ["Payroll", "Coffee Shop", "Grocery Store", "Uber", "Netflix"][i % 5],
+        "category": [["Transfer", "Payroll"], ["Food and Drink", "Coffee"], ["Shops", "Groceries"],
+                     ["Travel", "Taxi"], ["Service", "Subscription"]][i % 5],
+    }
+    txn.update(changes)
+    return txn
+
+
+def create_app(transactions=25, page_size=PAGE_SIZE):
+    app = Flask("mock_plaid")
+    # every change the item has seen, in order. a cursor is a position in this log,
+    # so a sync from a stored cursor returns only what was appended since
+    app.config.update(
+        changes=[("added", fixture_transaction(i)) for i in range(transactions)],
+        page_size=page_size,
+        requests=[],      # (path, body) of every call, for asserting round trips
+        fail_next=None,   # error_code to return once from /transactions/sync
+    )
+
+    def body():
+        data = request.get_json(force=True) or {}
+        app.config["requests"].append((request.path, data))
+        return data
+
+    def error(code, message, status=400):
+        return jsonify({"error_type": "ITEM_ERROR", "error_code": code, "error_message": message}), status
+
+    @app.post("/link/token/create")
+    def link_token():
+        body()
+        return jsonify({"link_token": f"link-mock-{uuid.uuid4()}", "request_id": uuid.uuid4().hex})
+
+    @app.post("/item/public_token/exchange")
+    def exchange():
+        body()
+        return jsonify({"access_token": ACCESS_TOKEN, "item_id": "item-mock", "request_id": uuid.uuid4().hex})
+
+    @app.post("/accounts/get")
+    def accounts():
+        if body().get("access_token") != ACCESS_TOKEN:
+            return error("INVALID_ACCESS_TOKEN", "provided access token is in an invalid format")
+        return jsonify({"accounts": fixture_accounts(), "request_id": uuid.uuid4().hex})
+
+    @app.post("/transactions/sync")
+    def sync():
+        data = body()
+        if data.get("access_token") != ACCESS_TOKEN:
+            return error("INVALID_ACCESS_TOKEN", "provided access token is in an invalid format")
+        if app.config["fail_next"]:
+            code, app.config["fail_next"] = app.config["fail_next"], None
+            return error(code, "underlying transaction data changed since the last page was fetched")
+
+        changes = app.config["changes"]
+        start = int(data.get("cursor") or 0)
+        count = min(int(data.get("count", 100)), app.config["page_size"])
+        page = changes[start:start + count]
+
+        result = {"added": [], "modified": [], "removed": []}
+        for kind, txn in page:
+            result[kind].append({"transaction_id": txn["transaction_id"]} if kind == "removed" else txn)
+        result.update(
+            next_cursor=str(start + len(page)),
+            has_more=start + len(page) < len(changes),
+            request_id=uuid.uuid4().hex,
+        )
+        return jsonify(result)
+
+    return app
+
+
+def add_change(app, kind, txn):
+    # kind is "added", "modified" or "removed"
+    app.config["changes"].append((kind, txn))
+
+
+def sync_requests(app):
+    return [data for path, data in app.config["requests"] if path == "/transactions/sync"]
+
+
+class MockPlaidServer:
+    # create_app() served on a background thread:
+    #   with MockPlaidServer() as server: plaid_api.base_url = server.url
+    def __init__(self, port=0, **kwargs):
+        self.app = create_app(**kwargs)
+        self.server = make_server("127.0.0.1", port, self.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    print(f"mock plaid on http://127.0.0.1:{port}, access token {ACCESS_TOKEN}")
+    create_app().run(port=port)
@@ -0,0 +1,82 @@
+import json
+import re
+
+import pytest
+
+from core import ai_suggestions
+from core.ai_suggestions import BudgetFinding, Findings
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    # request_chat without the network, answering every batch with numbered tips
+    calls = []
+
+    def request_chat(system_prompt, user_content, max_tokens=100):
+        calls.append(user_content)
+        count = len(re.findall(r"^\d+\. ", user_content, re.MULTILINE))
+        return json.dumps([f"tip {i}" for i in range(1, count + 1)])
+
+    monkeypatch.setattr(ai_suggestions, "request_chat", request_chat)
+    return calls
+
+
+def findings():
+    return Findings(
+        over_budget=[BudgetFinding("Food", 100.0, 150.0)],
+        near_budget=[BudgetFinding("Transport", 100.0, 90.0)],
+        top_recurring="Subscriptions",
+    )
+
+
+def test_cached_tips_are_stored_once(db, user, llm):
+    first = ai_suggestions.generate_suggestions(user, findings=findings())
+    second = ai_suggestions.generate_suggestions(user, findings=findings())
+
+    assert first == second == ["tip 1", "tip 2", "tip 3"]
+    # the second call was answered from the response cache
+    assert len(llm) == 1
+    rows = db.fetch_all("SELECT content FROM ai_suggestions WHERE user_id = ? ORDER BY suggestion_id", (user,))
+    assert [r["content"] for r in rows] == ["tip 1", "tip 2"]
+
+
+def test_insert_tip_keeps_one_copy_per_user(db, user):
+    assert ai_suggestions.insert_tip(user, "Save more.")
+    assert not ai_suggestions.insert_tip(user, "Save more.")
+    assert ai_suggestions.insert_tip(user, "Spend less.")
+    assert db.fetch_one("SELECT COUNT(*) FROM ai_suggestions")[0] == 2
+
+
+def mixed_findings():
+    # listed least severe first, overspending comes last in the dataclass
+    return Findings(
+        over_budget=[BudgetFinding("Food", 100.0, 110.0)],
+        near_budget=[BudgetFinding("Transport", 100.0, 90.0)],
+        top_recurring="Subscriptions",
+        income=100.0,
+        expense=300.0,
+    )
+
+
+def test_llm_tips_follow_the_local_ranking(db, user, llm):
+    findings = mixed_findings()
+    local = ai_suggestions.rank_local_tips(findings)
+    assert local[0].startswith("You're spending ₺200.00 more than you earn")
+
+    ai_suggestions.generate_suggestions(user, findings=findings)
+
+    # the prompt lists the findings in the order their local tips are shown
+    issues = re.findall(r"^\d+\. (.+)$", llm[0], re.MULTILINE)
+    assert issues == findings.summaries()
+    assert "total income is ₺100.00" in issues[0]
+    assert "Food" in issues[1] and "Transport" in issues[2] and "recurring" in issues[3]
+
+
+def test_fallback_replaces_the_same_finding(db, user, monkeypatch):
+    monkeypatch.setattr(ai_suggestions, "request_chat", lambda *a, **kw: "⚠️ API error: down")
+    findings = mixed_findings()
+
+    tips = ai_suggestions.generate_suggestions(user, findings=findings)
+
+    assert tips == ai_suggestions.rank_local_tips(findings)
+    assert db.fetch_one("SELECT COUNT(*) FROM ai_suggestions")[0] == 0
@@ -0,0 +1,41 @@
+import gzip
+
+import pytest
+
+from conftest import seed_user
+from pennywise.__main__ import main
+
+
+@pytest.fixture
+def seeded(db, tmp_path, monkeypatch):
+    # an empty working directory, the database lives in tmp_path
+    seed_user(db, 1, txns=50)
+    out = tmp_path / "out"
+    out.mkdir()
+    monkeypatch.chdir(out)
+    return out
+
+
+@pytest.mark.parametrize("argv", [
+    ["--format", "csv", "--out", "report.csv.gz"],
+    ["--format", "parquet", "--out", "x.arrow"],
+    ["--out", "report.txt"],
+    ["--format", "pdf", "--out", "report"],
+])
+def test_export_rejects_an_out_path_it_would_have_to_rename(seeded, argv, capsys):
+    assert main(["-q", "export", "--user", "1"] + argv) == 1
+    assert capsys.readouterr().err.splitlines()[-1].startswith(("--out", "--format"))
+    assert list(seeded.iterdir()) == []
+
+
+def test_export_takes_the_format_from_out(seeded):
+    assert main(["-q", "export", "--user", "1", "--out", "report.csv.gz"]) == 0
+    assert [p.name for p in seeded.iterdir()] == ["report.csv.gz"]
+    with gzip.open(seeded / "report.csv.gz", "rt") as f:
+        assert len(f.read().splitlines()) == 51
+
+
+def test_export_names_the_file_after_the_format(seeded):
+    assert main(["-q", "export", "--user", "1", "--format", "csv", "--out", "report.csv"]) == 0
+    assert main(["-q", "export", "--user", "1", "--format", "csv.gz"]) == 0
+    assert sorted(p.name for p in seeded.iterdir()) == ["report.csv", "transactions_1.csv.gz"]
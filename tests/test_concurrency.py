@@ -0,0 +1,75 @@
+import threading
+from datetime import date
+
+from conftest import seed_user
+
+WRITER_BATCHES = 40
+BATCH_SIZE = 250
+READERS = 3
+
+
+def plaid_batch(n):
+    return [{
+        "transaction_id": f"stress_{n}_{i}",
+        "account_id": "acc1_salary",
+        "amount": round(1 + (i % 50) * 1.5, 2) * (-1 if i % 7 == 0 else 1),
+        "date": f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+        "name": f"stress {i}",
+        "category": ["Shops", f"Group {i % 4}"],
+    } for i in range(BATCH_SIZE)]
+
+
+def test_writer_and_dashboard_readers_run_together(db):
+    from core.aggregates import verify_aggregates
+    from core.budget import get_budget_status
+    from core.transactions import (
+        get_account_balance, get_total_by_type, ingest_plaid_transactions, iter_txn_pages
+    )
+
+    seed_user(db, 1, txns=2000)
+    assert db.fetch_one("PRAGMA journal_mode")[0] == "wal"
+
+    errors = []
+    reads = [0] * READERS
+    done = threading.Event()
+
+    def writer():
+        # the plaid/flask thread: one transaction per synced batch
+        try:
+            for n in range(WRITER_BATCHES):
+                ingest_plaid_transactions(1, plaid_batch(n))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+            db.close_thread_connection()
+
+    def reader(slot):
+        # the qt thread rebuilding the dashboard over and over
+        try:
+            while not done.is_set():
+                get_total_by_type(1, "USD")
+                get_budget_status(1, on=date(2025, 6, 15))
+                get_account_balance(1)
+                next(iter_txn_pages(1, page_size=5, convert=False), [])
+                reads[slot] += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close_thread_connection()
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+
+    assert not any(t.is_alive() for t in threads)
+    # "database is locked" from either side would end up here
+    assert errors == []
+    assert all(reads), reads
+    assert db.fetch_one("SELECT COUNT(*) FROM transactions WHERE user_id = 1")[0] == \
+        2000 + WRITER_BATCHES * BATCH_SIZE
+    # the triggers kept the aggregates exact under concurrent writes
+    assert verify_aggregates(1) == []
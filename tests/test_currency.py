@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from conftest import seed_user
+from core import currency
+
+
+@pytest.fixture
+def stale_rates(db, monkeypatch):
+    # USD rates in fx_rates that are past RATES_TTL, and a network that's down
+    old = time.time() - currency.RATES_TTL - 60
+    db.execute_many("INSERT INTO fx_rates (base, quote, rate, fetched_at) VALUES (?, ?, ?, ?)",
+                    [("USD", "EUR", 0.9, old), ("USD", "GBP", 0.8, old)])
+    currency.clear_rate_cache()
+
+    calls = []
+
+    def fetch_rates(base="USD"):
+        calls.append(base)
+        return {}
+
+    monkeypatch.setattr(currency, "fetch_rates", fetch_rates)
+    yield calls
+    wait_for_refresh()
+    currency.clear_rate_cache()
+
+
+def wait_for_refresh():
+    deadline = time.time() + 5
+    while currency._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_failed_revalidation_is_not_retried_on_every_call(stale_rates):
+    for _ in range(20):
+        assert currency.convert(10, "USD", "EUR") == 9.0
+        wait_for_refresh()
+
+    # stale rates stay in use, and only one fetch went out
+    assert stale_rates == ["USD"]
+
+
+def test_revalidation_resumes_after_retry_after(stale_rates, monkeypatch):
+    currency.convert(10, "USD", "EUR")
+    wait_for_refresh()
+    assert stale_rates == ["USD"]
+
+    # back online once the backoff has passed
+    def fetch_rates(base="USD"):
+        stale_rates.append(base)
+        return {"EUR": 0.95}
+
+    currency._failed["USD"] = time.time() - currency.RETRY_AFTER - 1
+    monkeypatch.setattr(currency, "fetch_rates", fetch_rates)
+    currency.convert(10, "USD", "EUR")
+    wait_for_refresh()
+
+    assert stale_rates == ["USD", "USD"]
+    assert "USD" not in currency._failed
+    assert currency.convert(10, "USD", "EUR") == 9.5
+
+
+@pytest.fixture
+def rates(db, monkeypatch):
+    # latest USD rates in fx_rates, a short EUR history in fx_history, no network
+    now = time.time()
+    db.execute_many("INSERT INTO fx_rates (base, quote, rate, fetched_at) VALUES (?, ?, ?, ?)",
+                    [("USD", "EUR", 0.5, now), ("USD", "GBP", 0.8, now)])
+    db.execute_many("INSERT INTO fx_history (base, quote, date, rate) VALUES (?, ?, ?, ?)",
+                    [("EUR", "USD", "2024-01-01", 1.1), ("EUR", "USD", "2024-02-01", 1.2)])
+    currency.clear_rate_cache()
+    monkeypatch.setattr(currency, "fetch_rates", lambda base="USD": {})
+    yield
+    currency.clear_rate_cache()
+
+
+def test_historical_rate_uses_the_closest_earlier_day(rates):
+    assert currency.historical_rate("EUR", "USD", "2024-01-01") == 1.1
+    assert currency.historical_rate("EUR", "USD", "2024-01-31 09:00") == 1.1
+    assert currency.historical_rate("EUR", "USD", "2024-06-01") == 1.2
+    # only EUR->USD is stored, the other direction is its inverse
+    assert currency.historical_rate("USD", "EUR", "2024-02-10") == pytest.approx(1 / 1.2)
+
+
+def test_historical_rate_before_the_history_uses_the_latest_rate(rates):
+    # 1 / fx_rates USD->EUR
+    assert currency.historical_rate("EUR", "USD", "2023-12-31") == 2.0
+    assert currency.historical_rate("GBP", "USD", "2024-01-15") == 1.25
+    assert currency.historical_rate("XYZ", "USD", "2024-01-15") is None
+
+
+def test_fx_in_sql(db, rates):
+    assert db.fetch_one("SELECT fx(100, 'EUR', '2024-01-15', 'USD')")[0] == pytest.approx(110)
+    assert db.fetch_one("SELECT fx(100, NULL, '2024-01-15', 'USD')")[0] == 100
+    assert db.fetch_one("SELECT fx(100, 'XYZ', '2024-01-15', 'USD')")[0] is None
+
+
+def test_converted_totals_skip_amounts_without_a_rate(db, rates):
+    from core.transactions import add_txns_bulk, get_total_by_type
+    cats = seed_user(db, 1, txns=0)["categories"]
+    db.execute_query("""
+        INSERT INTO accounts (user_id, account_id, account_type, bank_name, currency)
+        VALUES (1, 'eur', 'savings', 'Bank', 'EUR'), (1, 'xyz', 'savings', 'Bank', 'XYZ')
+    """)
+    add_txns_bulk(1, [
+        ("acc1_salary", cats[0], 10.0, "expense", "", "2024-03-01", 0),
+        ("eur", cats[0], 100.0, "expense", "", "2024-01-15", 0),
+        ("eur", cats[0], 100.0, "expense", "", "2024-02-15", 0),
+        ("xyz", cats[0], 1000.0, "expense", "", "2024-02-15", 0),
+    ])
+
+    totals = {r["transaction_type"]: r["total"] for r in get_total_by_type(1, "USD")}
+    assert totals["expense"] == pytest.approx(10 + 110 + 120)
+    assert currency._missing == {("XYZ", "USD")}
+
+
+def test_convert_many(rates):
+    assert currency.convert_many([10, 1.005, 0], "USD", "EUR").tolist() == [5.0, 0.5, 0.0]
+    assert currency.convert_many([1.234], "EUR", "EUR").tolist() == [1.23]
+    assert currency.convert_many([10], "USD", "XYZ") is None
+
+
+def test_convert_rows(rates):
+    # every rate comes from the target's table, inverted
+    converted = currency.convert_rows([10, 10, 10, 10], ["USD", None, "EUR", "GBP"], "USD")
+    assert converted.tolist() == [10.0, 10.0, 20.0, 12.5]
+    assert currency.convert_rows([], [], "USD").tolist() == []
+    # no rate for XYZ: the amount is kept as is
+    assert currency.convert_rows([10, 10], ["XYZ", "EUR"], "USD").tolist() == [10.0, 20.0]
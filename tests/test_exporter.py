@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import seed_user
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def exported(db, tmp_path, request):
+    # user 1 with manual rows (no fingerprint) and a few plaid ones, written out
+    from core.exporter import write_arrow
+    from core.transactions import ingest_plaid_transactions
+    seed_user(db, 1, txns=300)
+    seed_user(db, 2, txns=0, seed=2)
+    ingest_plaid_transactions(1, [
+        {"transaction_id": f"p{i}", "amount": 12.5 + i, "date": f"2025-02-{i + 1:02d}", "name": "Shop",
+         "category": ["Shops"]}
+        for i in range(5)
+    ])
+    path = str(tmp_path / f"out.{request.param}")
+    ok, msg = write_arrow(1, path)
+    assert ok, msg
+    return path
+
+
+def count(db, user_id):
+    return db.fetch_one("SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,))[0]
+
+
+@pytest.mark.parametrize("exported", ["parquet", "arrow"], indirect=True)
+def test_round_trip_into_the_same_database_adds_nothing(db, exported):
+    from core.exporter import read_arrow
+    ok, msg = read_arrow(1, exported)
+
+    assert ok, msg
+    assert msg == "0 new rows imported, 305 already present"
+    assert count(db, 1) == 305
+
+
+@pytest.mark.parametrize("exported", ["parquet"], indirect=True)
+def test_import_into_another_user_once(db, exported):
+    from core.aggregates import verify_aggregates
+    from core.exporter import read_arrow
+
+    assert read_arrow(2, exported) == (True, "305 new rows imported, 0 already present")
+    assert read_arrow(2, exported) == (True, "0 new rows imported, 305 already present")
+    assert count(db, 2) == 305
+    assert verify_aggregates() == []
+
+
+@pytest.mark.parametrize("exported", ["parquet"], indirect=True)
+def test_edited_row_comes_back_as_new(db, exported):
+    from core.exporter import read_arrow
+    txn_id = db.fetch_one("SELECT MIN(transaction_id) FROM transactions WHERE fingerprint IS NULL")[0]
+    db.execute_query("UPDATE transactions SET amount = amount + 1 WHERE transaction_id = ?", (txn_id,))
+
+    assert read_arrow(1, exported) == (True, "1 new rows imported, 304 already present")
@@ -0,0 +1,178 @@
+import pytest
+import requests
+
+from core import http_client
+from core.http_client import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+class FakeTime:
+    # stands in for the time module inside http_client: sleep() moves the clock
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeSession:
+    # replays `outcomes` in order: an exception instance is raised, an int is a status code
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(method)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        res = requests.Response()
+        res.status_code = outcome
+        return res
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(http_client, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def session(monkeypatch, clock):
+    # fresh limiter/breaker state, no real network, no backoff jitter
+    monkeypatch.setattr(http_client, "_limiters", {})
+    monkeypatch.setattr(http_client, "_breakers", {})
+    monkeypatch.setattr(http_client, "_histograms", {})
+    monkeypatch.setattr(http_client, "_backoff", lambda attempt, retry_after=None: 0.1)
+
+    def use(*outcomes):
+        fake = FakeSession(outcomes)
+        monkeypatch.setattr(http_client, "session_for", lambda url: fake)
+        return fake
+
+    return use
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.now - 1000.0 == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_half_open_circuit_admits_one_probe(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    # the probe failed: closed to everyone for another cooldown
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+    # this probe succeeded
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow() and breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_a_cooldown(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_read_timeout_on_post_is_not_resent(session):
+    fake = session(requests.exceptions.ReadTimeout("slow"), 200)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        http_client.post("groq", "https://api.groq.test/chat", json={})
+    assert fake.calls == ["POST"]
+
+
+def test_failed_connects_are_retried(session):
+    fake = session(requests.exceptions.ConnectTimeout("no route"),
+                   requests.exceptions.ConnectionError("refused"), 200)
+    res = http_client.post("plaid", "https://plaid.test/transactions/sync", json={})
+    assert res.status_code == 200
+    assert len(fake.calls) == 3
+
+
+def test_retries_run_out(session):
+    fake = session(*[requests.exceptions.ConnectionError("refused")] * 3)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_client.post("groq", "https://api.groq.test/chat", json={})
+    # groq: 2 retries
+    assert len(fake.calls) == 3
+
+
+def test_read_timeouts_are_retried_where_opted_in(session):
+    fake = session(requests.exceptions.ReadTimeout("slow"), 200)
+    assert http_client.get("exchangerate", "https://rates.test/latest").status_code == 200
+    assert fake.calls == ["GET", "GET"]
+
+
+def test_429_and_5xx_are_retried(session, clock):
+    fake = session(429, 503, 200)
+    assert http_client.post("groq", "https://api.groq.test/chat", json={}).status_code == 200
+    assert len(fake.calls) == 3
+    # a 4xx is the caller's problem, returned as is
+    fake = session(400)
+    assert http_client.post("groq", "https://api.groq.test/chat", json={}).status_code == 400
+    assert len(fake.calls) == 1
+
+
+def test_open_circuit_fails_fast(session):
+    fake = session(*[requests.exceptions.ConnectionError("refused")] * 3)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_client.post("groq", "https://api.groq.test/chat", json={})
+    # 3 failures opened groq's circuit, nothing else goes out
+    with pytest.raises(CircuitOpenError):
+        http_client.post("groq", "https://api.groq.test/chat", json={})
+    assert len(fake.calls) == 3
+    assert http_client.circuit_status()["groq"] == "open"
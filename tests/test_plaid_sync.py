@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+from database import db_manager, migrations
+from database.db_manager import SCHEMA_PATH
+from mock_plaid_server import ACCESS_TOKEN, MockPlaidServer, add_change, fixture_transaction, sync_requests
+
+
+@pytest.fixture
+def plaid(monkeypatch):
+    # core/plaid_api.py talking to the local mock server instead of plaid
+    from core import plaid_api
+    with MockPlaidServer() as server:
+        monkeypatch.setattr(plaid_api, "base_url", server.url)
+        monkeypatch.setattr(plaid_api, "use_mock", False)
+        yield server.app
+
+
+def plaid_account(account_id, name, subtype="checking", currency="USD"):
+    return {"account_id": account_id, "name": name, "subtype": subtype,
+            "balances": {"iso_currency_code": currency}}
+
+
+def test_link_pages_through_sync_and_stores_the_cursor(db, user, plaid):
+    from core.plaid_sync import get_cursor, link_item
+    result = link_item(user, ACCESS_TOKEN)
+
+    assert "error" not in result
+    assert result["synced"] == {"added": 25, "modified": 0, "removed": 0}
+    # 25 fixtures in pages of 10, each request carries the previous page's cursor
+    assert [r.get("cursor") for r in sync_requests(plaid)] == [None, "10", "20"]
+    assert get_cursor(ACCESS_TOKEN) == "25"
+    assert db.fetch_one("SELECT COUNT(*) FROM transactions WHERE user_id = 1")[0] == 25
+    assert db.fetch_one("SELECT COUNT(*) FROM accounts WHERE user_id = 1")[0] == 2
+
+
+def test_sync_only_fetches_the_delta(db, user, plaid):
+    from core.aggregates import verify_aggregates
+    from core.plaid_sync import link_item, sync_item
+    link_item(user, ACCESS_TOKEN)
+    plaid.config["requests"].clear()
+
+    assert sync_item(user, ACCESS_TOKEN) == {"added": 0, "modified": 0, "removed": 0}
+    assert [r.get("cursor") for r in sync_requests(plaid)] == ["25"]
+
+    add_change(plaid, "added", fixture_transaction(100))
+    add_change(plaid, "modified", fixture_transaction(3, amount=99.5, name="Uber Eats"))
+    add_change(plaid, "removed", fixture_transaction(4))
+    assert sync_item(user, ACCESS_TOKEN) == {"added": 1, "modified": 1, "removed": 1}
+
+    # fixture i is dated 2025-01-01 + i days
+    rows = {r["date"]: (r["description"], r["amount"])
+            for r in db.fetch_all("SELECT date, description, amount FROM transactions")}
+    assert len(rows) == 25
+    assert rows["2025-01-04"] == ("Uber Eats", 99.5)
+    assert "2025-01-05" not in rows
+    assert "2025-04-11" in rows
+    assert verify_aggregates(user) == []
+
+
+def test_sync_restarts_after_mutation_during_pagination(db, user, plaid):
+    from core.plaid_sync import sync_item
+    plaid.config["fail_next"] = "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"
+
+    assert sync_item(user, ACCESS_TOKEN) == {"added": 25, "modified": 0, "removed": 0}
+    assert [r.get("cursor") for r in sync_requests(plaid)] == [None, None, "10", "20"]
+
+
+def test_refresh_reports_bad_items_and_keeps_the_good_ones(db, user, plaid):
+    from core.plaid_sync import refresh_items
+    result = refresh_items(user, [ACCESS_TOKEN, "access-revoked"])
+
+    assert result["synced"] == {"added": 25, "modified": 0, "removed": 0}
+    assert list(result["errors"]) == ["access-revoked"]
+    assert db.fetch_one("SELECT COUNT(*) FROM transactions")[0] == 25
+
+
+def test_relinking_updates_accounts_in_place(db, user):
+    from core.plaid_sync import save_plaid_accounts
+    save_plaid_accounts(1, "token-1", [plaid_account("acc1", "Old Name"), plaid_account("acc2", "Savings", "savings")])
+    save_plaid_accounts(1, "token-2", [plaid_account("acc1", "New Name", currency="EUR")])
+
+    rows = db.fetch_all("SELECT account_id, bank_name, currency, plaid_token FROM accounts ORDER BY account_id")
+    assert [tuple(r) for r in rows] == [
+        ("acc1", "New Name", "EUR", "token-2"),
+        ("acc2", "Savings", "USD", "token-1"),
+    ]
+
+
+def test_migration_collapses_duplicate_accounts(tmp_path, monkeypatch):
+    # a database from before migration 12, with the duplicates re-linking used to leave behind
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH) as f:
+        conn.executescript(f.read())
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m[0] < 12])
+    migrations.migrate(conn)
+    monkeypatch.undo()
+
+    conn.executescript("""
+        INSERT INTO users (user_id, email, username, password_hash, role) VALUES
+            (1, 'a@example.com', 'a', 'x', 'End User'), (2, 'b@example.com', 'b', 'x', 'End User');
+        INSERT INTO accounts (user_id, account_id, account_type, bank_name) VALUES
+            (1, 'acc1', 'salary', 'first'), (1, 'acc1', 'salary', 'second'),
+            (1, 'acc2', 'savings', 'only'), (1, 'acc1', 'salary', 'newest'),
+            (2, 'acc1', 'salary', 'other user');
+        INSERT INTO transactions (user_id, account_id, amount, transaction_type, date) VALUES
+            (1, 'acc1', 100, 'income', '2025-01-01'), (1, 'acc1', 30, 'expense', '2025-01-02'),
+            (1, 'acc2', 5, 'income', '2025-01-03');
+    """)
+    conn.close()
+
+    db_manager.close_all_connections()
+    monkeypatch.setattr(db_manager, "DB_PATH", str(path))
+    try:
+        db_manager.initialize_db()
+        rows = db_manager.fetch_all("SELECT user_id, account_id, bank_name FROM accounts ORDER BY user_id, account_id")
+        assert [tuple(r) for r in rows] == [(1, "acc1", "newest"), (1, "acc2", "only"), (2, "acc1", "other user")]
+
+        with pytest.raises(sqlite3.IntegrityError):
+            db_manager.execute_query(
+                "INSERT INTO accounts (user_id, account_id, account_type) VALUES (1, 'acc1', 'salary')")
+
+        # joins on account_id no longer fan out
+        from core.transactions import get_account_balance, get_all_txns
+        assert len(get_all_txns(1, convert=False)) == 3
+        assert get_account_balance(1) == pytest.approx(70)
+    finally:
+        db_manager.close_all_connections()
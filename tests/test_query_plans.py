@@ -0,0 +1,125 @@
+import inspect
+import sqlite3
+from datetime import date
+
+import pytest
+
+from conftest import seed_user
+from database.db_manager import SCHEMA_PATH
+from database.migrations import MIGRATIONS, migrate
+
+
+@pytest.fixture
+def seeded(db):
+    # two users so every query has to narrow by user_id
+    seed_user(db, 1)
+    seed_user(db, 2, seed=2)
+    return db
+
+
+def query_plans(db, func, *args, **kwargs):
+    # runs func and returns [(sql, plan lines)] for every SELECT it sent to sqlite.
+    # the trace callback sees the sql with its parameters filled in, so it can be explained as is
+    conn = db.get_conn()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args, **kwargs)
+        if inspect.isgenerator(result):
+            # two pages, the second one goes through the keyset condition
+            next(result, None)
+            next(result, None)
+    finally:
+        conn.set_trace_callback(None)
+    return [(sql, [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)])
+            for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def plan_on(plans, table):
+    # the plan of the query that reads `table`
+    for sql, plan in plans:
+        if f" {table} " in f" {' '.join(sql.split())} ":
+            return plan
+    raise AssertionError(f"no query read {table}: {[sql for sql, _ in plans]}")
+
+
+def assert_search(plan, table, index):
+    # `table` (or its alias) is looked up through `index`, never scanned
+    lines = [line for line in plan if line.split()[1:2] == [table]]
+    assert lines, plan
+    assert lines[0].startswith(f"SEARCH {table} USING"), plan
+    assert index in lines[0], plan
+
+
+def test_migrate_brings_base_schema_up_to_date(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    with open(SCHEMA_PATH) as f:
+        conn.executescript(f.read())
+
+    assert migrate(conn) == [m[0] for m in MIGRATIONS]
+    assert migrate(conn) == []
+
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_transactions_user_date", "idx_transactions_user_cat_type",
+            "idx_transactions_account", "idx_transactions_spend"} <= indexes
+    conn.close()
+
+
+def test_budget_status_is_a_range_search(seeded):
+    from core.budget import get_budget_status
+    plans = query_plans(seeded, get_budget_status, 1, on=date(2025, 3, 15))
+    plan = plan_on(plans, "transactions")
+    assert_search(plan, "transactions", "COVERING INDEX idx_transactions_spend")
+    assert_search(plan, "c", "idx_categories_user")
+
+
+def test_recent_activity_pages_walk_the_date_index(seeded):
+    from core.transactions import iter_txn_pages
+    plans = query_plans(seeded, iter_txn_pages, 1, page_size=5, convert=False)
+    assert len(plans) >= 2
+    for sql, plan in plans:
+        if " transactions t" in sql:
+            assert_search(plan, "t", "idx_transactions_user_date")
+            assert_search(plan, "a", "idx_accounts_user_account")
+            # rows come off the index already ordered, no sort of the user's whole history
+            assert not any("ORDER BY" in line for line in plan), plan
+
+
+def test_account_filtered_queries_use_an_index(seeded):
+    from core.transactions import count_txns, iter_txn_pages
+    plans = query_plans(seeded, iter_txn_pages, 1, account_id="acc1_salary", page_size=5, convert=False)
+    assert_search(plan_on(plans, "transactions"), "t", "idx_transactions_user_date")
+
+    plans = query_plans(seeded, count_txns, 1, account_id="acc1_salary", start="2025-01-01")
+    assert_search(plan_on(plans, "transactions"), "t", "idx_transactions_user_date")
+
+
+def test_totals_read_the_aggregates(seeded):
+    from core.transactions import get_total_by_type, get_txn_summary_by_cat
+    plans = query_plans(seeded, get_total_by_type, 1, "USD")
+    assert_search(plan_on(plans, "category_spend"), "category_spend", "sqlite_autoindex_category_spend_1")
+    plan = plan_on(plans, "account_balance")
+    assert_search(plan, "b", "sqlite_autoindex_account_balance_1")
+    assert_search(plan, "a", "idx_accounts_user_account")
+
+    plans = query_plans(seeded, get_txn_summary_by_cat, 1, "USD")
+    plan = plan_on(plans, "category_spend")
+    assert_search(plan, "s", "sqlite_autoindex_category_spend_1")
+    assert_search(plan, "c", "PRIMARY KEY")
+
+
+def test_converted_totals_search_transactions(seeded):
+    from core.transactions import get_total_by_type
+    seeded.execute_query("UPDATE accounts SET currency = 'EUR' WHERE account_id = 'acc1_savings'")
+    plans = query_plans(seeded, get_total_by_type, 1, "USD")
+    plan = plan_on(plans, "transactions")
+    assert_search(plan, "t", "INDEX idx_transactions_")
+    assert_search(plan, "a", "idx_accounts_user_account")
+
+
+def test_account_balance_searches_both_tables(seeded):
+    from core.transactions import get_account_balance
+    plans = query_plans(seeded, get_account_balance, 1)
+    plan = plan_on(plans, "account_balance")
+    assert_search(plan, "a", "idx_accounts_user_account")
+    assert_search(plan, "b", "sqlite_autoindex_account_balance_1")
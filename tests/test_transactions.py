@@ -0,0 +1,29 @@
+from conftest import seed_user
+
+
+def test_pages_include_rows_without_a_date(db):
+    from core.transactions import add_txns_bulk, count_txns, iter_txn_pages
+    cats = seed_user(db, 1, txns=250)["categories"]
+    # tuple rows keep a None date as NULL
+    add_txns_bulk(1, [("acc1_salary", cats[0], 5.0, "expense", "undated", None, 0) for _ in range(7)])
+
+    pages = list(iter_txn_pages(1, page_size=3, convert=False))
+    rows = [t for page in pages for t in page]
+
+    assert len(rows) == count_txns(1) == 257
+    assert len({t.transaction_id for t in rows}) == 257
+    # newest first, undated rows last
+    dates = [t.date for t in rows]
+    assert dates[-7:] == [None] * 7
+    assert dates[:-7] == sorted(dates[:-7], reverse=True)
+    assert [t.transaction_id for t in rows[-7:]] == sorted((t.transaction_id for t in rows[-7:]), reverse=True)
+
+
+def test_date_filters_leave_undated_rows_out(db):
+    from core.transactions import add_txns_bulk, count_txns, iter_txns
+    cats = seed_user(db, 1, txns=100)["categories"]
+    add_txns_bulk(1, [("acc1_salary", cats[0], 5.0, "expense", "undated", None, 0)])
+
+    rows = list(iter_txns(1, start="2025-01-01", page_size=4, convert=False))
+    assert len(rows) == count_txns(1, start="2025-01-01")
+    assert all(t.date for t in rows)
@@ -1,13 +1,36 @@
 from PyQt5.QtWidgets import QWidget,QVBoxLayout,QLabel,QMessageBox,QPushButton
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl,pyqtSlot
-from core.plaid_api import create_link_token,exchange_public_token,get_accounts,get_transactions
-from core.transactions import insert_plaid_transaction
-from database.db_manager import execute_query,fetch_all
-import datetime
+from PyQt5.QtCore import QUrl,pyqtSlot,QThread,pyqtSignal
+from core.plaid_api import create_link_token,exchange_public_token
+from core.plaid_sync import link_item,refresh_items,linked_tokens
+from database.db_manager import close_thread_connection
 import webbrowser
 
 
+class RefreshWorker(QThread):
+    # runs refresh_items off the gui thread and reports back through signals
+    progress = pyqtSignal(int,int)
+    finished_refresh = pyqtSignal(dict)
+
+    def __init__(self,user_id,access_tokens,max_workers=4):
+        super().__init__()
+        self.user_id = user_id
+        self.access_tokens = access_tokens
+        self.max_workers = max_workers
+
+    def run(self):
+        try:
+            result = refresh_items(
+                self.user_id,self.access_tokens,self.max_workers,
+                progress=lambda done,total: self.progress.emit(done,total)
+            )
+        except Exception as e:
+            result = {"accounts": [],"errors": {"refresh": str(e)}}
+        finally:
+            close_thread_connection()
+        self.finished_refresh.emit(result)
+
+
 class BankConnectWindow(QWidget):
     def __init__(self,user_id,parent=None):
         super().__init__()
@@ -105,41 +128,13 @@ class BankConnectWindow(QWidget):
         self.process_accounts(access_token)
 
     def process_accounts(self,access_token):
-        accounts_data = get_accounts(access_token)
+        # saves the accounts and syncs only transactions changed since the last refresh
+        accounts_data = link_item(self.user_id,access_token)
 
         if "error" in accounts_data:
             QMessageBox.critical(self,"Error",accounts_data["error"])
             return
 
-        # save to db
-        for acc in accounts_data.get("accounts",[]):
-            q = """
-            INSERT OR REPLACE INTO accounts (
-                account_id, user_id, bank_name, account_type, 
-                currency, plaid_token, last_sync
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
-            account_type = "salary" if "checking" in acc.get("subtype","").lower() else "savings"
-            execute_query(q,(
-                acc["account_id"],
-                self.user_id,
-                acc.get("name","Unknown Bank"),
-                account_type,
-                acc.get("balances",{}).get("iso_currency_code","USD"),
-                access_token,
-                datetime.datetime.now().isoformat()
-            ),commit=True)
-
-        # fetch recent transactions
-        start_date = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-        end_date = datetime.datetime.now().strftime("%Y-%m-%d")
-        txns_data = get_transactions(access_token,start_date,end_date)
-
-        if "transactions" in txns_data:
-            for txn in txns_data["transactions"]:
-                account_id = txn.get("account_id")
-                insert_plaid_transaction(self.user_id,account_id,txn)
-
         if self.parent_dashboard:
             self.parent_dashboard.refresh_dashboard()
 
@@ -189,19 +184,32 @@ class BankConnectWindow(QWidget):
 
     def refresh_accounts(self):
         #  all access tokens for this user
-        accounts = fetch_all("""
-            SELECT DISTINCT plaid_token FROM accounts 
-            WHERE user_id = ? AND plaid_token IS NOT NULL
-        """,(self.user_id,))
+        tokens = linked_tokens(self.user_id)
 
-        if not accounts:
+        if not tokens:
             QMessageBox.warning(self,"Error","No linked accounts found")
             return
 
-        for account in accounts:
-            self.process_accounts(account["plaid_token"])
+        self.refresh_btn.setEnabled(False)
+        self.status_label.setText(f"🔄 Refreshing 0/{len(tokens)} banks...")
+
+        self.refresh_worker = RefreshWorker(self.user_id,tokens)
+        self.refresh_worker.progress.connect(self.on_refresh_progress)
+        self.refresh_worker.finished_refresh.connect(self.on_refresh_done)
+        self.refresh_worker.start()
+
+    def on_refresh_progress(self,done,total):
+        self.status_label.setText(f"🔄 Refreshing {done}/{total} banks...")
+
+    def on_refresh_done(self,result):
+        self.refresh_btn.setEnabled(True)
+        self.display_accounts(result)
 
-        QMessageBox.information(self,"Success","Accounts refreshed")
+        errors = result.get("errors")
+        if errors:
+            QMessageBox.warning(self,"Refresh","Some banks failed to refresh:\n" + "\n".join(errors.values()))
+        else:
+            QMessageBox.information(self,"Success","Accounts refreshed")
         if self.parent_dashboard:
             self.parent_dashboard.update_dashboard()
 
@@ -2,9 +2,9 @@ from PyQt5.QtWidgets import (
     QWidget, QLabel, QVBoxLayout, QHBoxLayout,
     QComboBox, QLineEdit, QPushButton, QMessageBox, QProgressBar
 )
-from core.budget import set_budget, get_spent, get_budget
+from core.budget import set_budget, get_budget_status, BUDGET_PERIODS, ROLLOVER_MODES
 from database.db_manager import fetch_all, fetch_one
-from core.currency import convert
+from core.currency import convert_many
 
 class BudgetWindow(QWidget):
     def __init__(self, user_id):
@@ -15,6 +15,10 @@ class BudgetWindow(QWidget):
 
         self.cat_select = QComboBox()
         self.amount_input = QLineEdit()
+        self.period_select = QComboBox()
+        self.period_select.addItems(BUDGET_PERIODS)
+        self.rollover_select = QComboBox()
+        self.rollover_select.addItems(ROLLOVER_MODES)
         self.save_btn = QPushButton("set budget")
         self.progress = QProgressBar()
 
@@ -36,6 +40,12 @@ class BudgetWindow(QWidget):
         box.addWidget(QLabel("budget limit"))
         box.addWidget(self.amount_input)
 
+        box.addWidget(QLabel("period"))
+        box.addWidget(self.period_select)
+
+        box.addWidget(QLabel("rollover"))
+        box.addWidget(self.rollover_select)
+
         box.addWidget(self.save_btn)
 
         box.addWidget(QLabel("usage"))
@@ -63,18 +73,20 @@ class BudgetWindow(QWidget):
         if not cat_id:
             return None,None,None
 
-        # Get spent amount for this category (converted to user currency if needed)
-        spent = get_spent(self.user_id,cat_id)  # from core.budget
-
-        # Get budget limit for this category
-        budget = get_budget(self.user_id,cat_id)  # from core.budget
+        # this period's spend and budget (rollover included) for the category
+        status = next((s for s in get_budget_status(self.user_id) if s["category_id"] == cat_id),None)
+        if status is None:
+            return None,None,None
+        self.period_select.setCurrentText(status["budget_period"])
+        self.rollover_select.setCurrentText(status["budget_rollover"])
 
         # Get user currency from settings
         curr = self.get_user_currency()
 
-        # Convert spent and budget to user currency if needed
-        spent_c = convert(spent,"USD",curr) if spent is not None else 0.0
-        budget_c = convert(budget,"USD",curr) if budget is not None else 0.0
+        # Convert spent and budget to user currency if needed (one rate lookup for both)
+        amounts = [status["spent"] or 0.0,status["available"] or 0.0]
+        converted = convert_many(amounts,"USD",curr)
+        spent_c,budget_c = (float(v) for v in (converted if converted is not None else amounts))
 
         return spent_c,budget_c,curr
 
@@ -105,7 +117,8 @@ class BudgetWindow(QWidget):
         try:
             amt = float(self.amount_input.text())
             cat_id = self.cat_select.currentData()
-            set_budget(self.user_id, cat_id, amt)
+            set_budget(self.user_id, cat_id, amt,
+                       self.period_select.currentText(), self.rollover_select.currentText())
             QMessageBox.information(self, "done", "budget updated")
             self.refresh_stats()
         except ValueError:
@@ -3,27 +3,25 @@ from PyQt5.QtWidgets import (
     QStackedWidget,QFrame,QComboBox,QSizePolicy,QScrollArea,QApplication
 )
 from PyQt5.QtGui import QPixmap,QFont,QIcon
-from PyQt5.QtCore import Qt,QSize
+from PyQt5.QtCore import Qt,QSize,QObject,QRunnable,QThreadPool,pyqtSignal
 import qtawesome as qta
-from datetime import datetime,timedelta
 import webbrowser
 from flask import Flask,request
 import threading
 import os
 import traceback
 
-from core.ai_suggestions import get_recent_suggestions,generate_suggestions
+from core.ai_suggestions import get_recent_suggestions,generate_suggestions,collect_findings,rank_local_tips
 from ui.transaction_form import TransactionForm
 from ui.budget_window import BudgetWindow
 from ui.charts_window import ChartsWindow
 from ui.settings_window import SettingsWindow,DARK_QSS,LIGHT_QSS
 from ui.bank_connect_window import BankConnectWindow
-from database.db_manager import fetch_all,fetch_one,execute_query
-from core.transactions import get_total_by_type,insert_plaid_transaction
-from core.currency import convert
+from database.db_manager import fetch_all,fetch_one,close_thread_connection
+from core.transactions import get_total_by_type,iter_txn_pages
+from core.budget import get_budget_status
 from ui.commitment_form import CommitmentForm
-from core.salary_checker import check_salary_reminder
-from core.commitment_manager import check_commitments
+from core.scheduler import Scheduler
 from PyQt5.QtWidgets import (
     QWidget,QLabel,QVBoxLayout,QHBoxLayout,QScrollArea,QSizePolicy
 )
@@ -31,12 +29,37 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QGridLayout
 from core.transfer import get_recent_category_transfers
 from PyQt5.QtWidgets import QGraphicsDropShadowEffect
-from core.plaid_api import create_link_token,exchange_public_token,get_accounts,get_transactions
+from core.plaid_api import create_link_token,exchange_public_token
+from core.plaid_sync import link_item
 from ui.category_manager import CategoryManager
 from ui.savings_goal_manager import SavingsGoalManager
 
 
 
+class SuggestionSignals(QObject):
+    done = pyqtSignal(list)
+
+
+class SuggestionWorker(QRunnable):
+    # generates ai tips on a pool thread so the dashboard can show up right away
+    def __init__(self,user_id,findings=None):
+        super().__init__()
+        self.user_id = user_id
+        self.findings = findings
+        self.signals = SuggestionSignals()
+
+    def run(self):
+        # emits the tips to show, one per finding, with local tips already filling in
+        # for any the llm couldn't answer. reminders share ai_suggestions, so don't
+        # read the tips back from there
+        try:
+            tips = generate_suggestions(self.user_id,findings=self.findings)
+        except Exception:
+            traceback.print_exc()
+            tips = []
+        finally:
+            close_thread_connection()
+        self.signals.done.emit(tips)
 
 
 class UserDashboard(QMainWindow):
@@ -56,10 +79,30 @@ class UserDashboard(QMainWindow):
 
         self.init_sidebar()
         self.init_pages()
-        generate_suggestions(self.user_id)
         self.show_dashboard()
 
+        # commitment / salary reminders and the monthly reset run off the ui thread
+        self.scheduler = Scheduler(self.user_id)
+        self.scheduler.start()
+
         self.start_flask_thread()
+        self.start_suggestion_worker()
+
+    def start_suggestion_worker(self):
+        # tips land in the already rendered dashboard when they're ready
+        # reuses the findings add_ai_tips() ranked the local tips from
+        self.suggestion_worker = SuggestionWorker(self.user_id,self.findings)
+        self.suggestion_worker.signals.done.connect(self.on_suggestions_ready)
+        QThreadPool.globalInstance().start(self.suggestion_worker)
+
+    def on_suggestions_ready(self,tips):
+        # swap the local tips for llm text. nothing to flag keeps what's shown
+        if tips:
+            self.render_tips(tips)
+
+    def closeEvent(self,event):
+        self.scheduler.stop()
+        super().closeEvent(event)
 
     def is_dark_mode(self):
         result = fetch_one("SELECT dark_mode FROM settings WHERE user_id = ?",(self.user_id,))
@@ -69,6 +112,11 @@ class UserDashboard(QMainWindow):
         app = Flask(__name__)
         dashboard_ref = self
 
+        @app.teardown_request
+        def release_db(exc):
+            # flask serves each request on its own thread, give its connection back
+            close_thread_connection()
+
         @app.route("/success")
         def plaid_success():
             try:
@@ -82,32 +130,8 @@ class UserDashboard(QMainWindow):
 
                     access_token = data.get("access_token")
                     if access_token:
-                        accounts = get_accounts(access_token)
-                        print("✅ Retrieved accounts:",accounts)
-
-                        for acc in accounts.get("accounts",[]):
-                            account_type = "salary" if "checking" in acc.get("subtype","").lower() else "savings"
-                            execute_query("""
-                                INSERT OR REPLACE INTO accounts (
-                                    account_id, user_id, bank_name, account_type,
-                                    currency, plaid_token, last_sync
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """,(
-                                acc["account_id"],
-                                dashboard_ref.user_id,
-                                acc.get("name","Unknown"),
-                                account_type,
-                                acc.get("balances",{}).get("iso_currency_code","USD"),
-                                access_token,
-                                datetime.now().isoformat()
-                            ),commit=True)
-
-                        start = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-                        end = datetime.now().strftime("%Y-%m-%d")
-                        txns = get_transactions(access_token,start,end)
-
-                        for txn in txns.get("transactions",[]):
-                            insert_plaid_transaction(dashboard_ref.user_id,txn["account_id"],txn)
+                        result = link_item(dashboard_ref.user_id,access_token)
+                        print("✅ Synced item:",result.get("synced",result))
 
                         dashboard_ref.refresh_dashboard()
 
@@ -304,12 +328,13 @@ class UserDashboard(QMainWindow):
             background-color: transparent;
         """)
 
+        # balances come from the account_balance aggregate, one row per account
         accounts = fetch_all("""
             SELECT a.account_id, a.bank_name, a.account_type,
                    COALESCE(
-                       (SELECT SUM(CASE WHEN t.transaction_type = 'income' THEN t.amount ELSE -t.amount END)
-                        FROM transactions t 
-                        WHERE t.account_id = a.account_id), 0) as balance
+                       (SELECT SUM(b.balance)
+                        FROM account_balance b
+                        WHERE b.user_id = a.user_id AND b.account_id = a.account_id), 0) as balance
             FROM accounts a
             WHERE a.user_id = ?
         """,(self.user_id,))
@@ -376,20 +401,13 @@ class UserDashboard(QMainWindow):
 
     def calculate_account_balance(self,account_id):
 
-        transactions = fetch_all("""
-                SELECT amount, transaction_type 
-                FROM transactions 
-                WHERE account_id = ?
-            """,(account_id,))
-
-        balance = 0
-        for txn in transactions:
-            if txn["transaction_type"] == "income":
-                balance += txn["amount"]
-            else:
-                balance -= txn["amount"]
+        row = fetch_one("""
+                SELECT SUM(balance) AS balance
+                FROM account_balance
+                WHERE user_id = ? AND account_id = ?
+            """,(self.user_id,account_id))
 
-        return balance
+        return row["balance"] or 0
 
     def create_account_widget(self,bank_name,account_type,balance):
         widget = QFrame()
@@ -429,18 +447,14 @@ class UserDashboard(QMainWindow):
         return widget
 
     def update_financial_overview(self,layout):
-        totals = get_total_by_type(self.user_id)
-        income = next((t["total"] for t in totals if t["transaction_type"] == "income"),0)
-        expense = next((t["total"] for t in totals if t["transaction_type"] == "expense"),0)
-        balance = income - expense
-
         user_currency = fetch_one("SELECT currency FROM settings WHERE user_id = ?",(self.user_id,))
         currency = user_currency["currency"] if user_currency else "USD"
 
-        if currency != "USD":
-            income = convert(income,"USD",currency) or income
-            expense = convert(expense,"USD",currency) or expense
-            balance = convert(balance,"USD",currency) or balance
+        # each transaction is converted at its own date's rate inside the query
+        totals = get_total_by_type(self.user_id,currency)
+        income = next((t["total"] for t in totals if t["transaction_type"] == "income"),0) or 0
+        expense = next((t["total"] for t in totals if t["transaction_type"] == "expense"),0) or 0
+        balance = income - expense
 
         overview_frame = QFrame()
         overview_frame.setStyleSheet(f"""
@@ -503,15 +517,8 @@ class UserDashboard(QMainWindow):
         return card
 
     def add_recent_activity(self,layout):
-        transactions = fetch_all("""
-            SELECT t.*, c.category_name, a.bank_name 
-            FROM transactions t
-            LEFT JOIN categories c ON t.category_id = c.category_id
-            LEFT JOIN accounts a ON t.account_id = a.account_id
-            WHERE t.user_id = ?
-            ORDER BY t.date DESC
-            LIMIT 5
-        """,(self.user_id,))
+        # first page only, amounts as entered
+        transactions = next(iter_txn_pages(self.user_id,page_size=5,convert=False),[])
 
         activity_frame = QFrame()
         activity_frame.setStyleSheet(f"""
@@ -632,8 +639,6 @@ class UserDashboard(QMainWindow):
     def show_dashboard(self):
         self.stack.setCurrentWidget(self.page_dashboard)
         self.highlight_nav("Dashboard")
-        check_commitments(self.user_id)
-        check_salary_reminder(self.user_id)
 
     def show_transactions(self):
         self.stack.setCurrentWidget(self.page_transactions)
@@ -642,38 +647,57 @@ class UserDashboard(QMainWindow):
     def add_ai_tips(self,layout):
         print("Fetching AI tips for user:",self.user_id)
 
-        try:
-            tips = get_recent_suggestions(self.user_id)
-            print(f"Found {len(tips)} tips")
+        # holder that render_tips() refills when new suggestions arrive
+        self.tips_holder = QWidget()
+        self.tips_layout = QVBoxLayout(self.tips_holder)
+        self.tips_layout.setContentsMargins(0,0,0,0)
+        layout.addWidget(self.tips_holder)
 
+        self.findings = None
+        try:
+            # rule based tips render instantly, the background worker replaces them
+            # with llm text when it arrives. stored tips if there's nothing to flag
+            self.findings = collect_findings(self.user_id)
+            tips = rank_local_tips(self.findings)
             if not tips:
-                no_tips = QLabel("No financial tips available yet.")
-                no_tips.setStyleSheet("color: #6c757d; font-style: italic;")
-                layout.addWidget(no_tips)
-            else:
-                # Just show the first tip only
-                first_tip = tips[0]
-
-                tip_label = QLabel(first_tip["content"])
-                tip_label.setWordWrap(True)
-                tip_label.setStyleSheet("""
-                    background-color:  {'#1e1e1e' if self.is_dark_mode() else 'white'};
-                    padding: 20px;
-                    border-radius: 10px;
-                    font-size: 15px;
-                    border: none;
-                    font-family: 'Segoe UI', sans-serif;
-                    color:  {'#FFFDD0' if self.is_dark_mode() else '#333'};
-                    border-left: 4px solid #d6733a;
-                """)
-
-                layout.addWidget(tip_label)
+                tips = [t["content"] for t in get_recent_suggestions(self.user_id)]
+            print(f"Found {len(tips)} tips")
+            self.render_tips(tips)
 
         except Exception as e:
             print(f"Error displaying tips: {e}")
             error_label = QLabel("Could not load financial tips. Please try again later.")
             error_label.setStyleSheet("color: #dc3545; font-size: 14px;")
-            layout.addWidget(error_label)
+            self.tips_layout.addWidget(error_label)
+
+    def render_tips(self,tips):
+        for i in reversed(range(self.tips_layout.count())):
+            widget = self.tips_layout.itemAt(i).widget()
+            if widget:
+                widget.deleteLater()
+
+        if not tips:
+            no_tips = QLabel("No financial tips available yet.")
+            no_tips.setStyleSheet("color: #6c757d; font-style: italic;")
+            self.tips_layout.addWidget(no_tips)
+        else:
+            # Just show the first tip only
+            first_tip = tips[0]
+
+            tip_label = QLabel(first_tip)
+            tip_label.setWordWrap(True)
+            tip_label.setStyleSheet("""
+                background-color:  {'#1e1e1e' if self.is_dark_mode() else 'white'};
+                padding: 20px;
+                border-radius: 10px;
+                font-size: 15px;
+                border: none;
+                font-family: 'Segoe UI', sans-serif;
+                color:  {'#FFFDD0' if self.is_dark_mode() else '#333'};
+                border-left: 4px solid #d6733a;
+            """)
+
+            self.tips_layout.addWidget(tip_label)
 
     def show_budget(self):
         self.stack.setCurrentWidget(self.page_budget)
@@ -706,6 +730,7 @@ class UserDashboard(QMainWindow):
     def open_commitment_form(self,category_name):
         dlg = CommitmentForm(self.user_id,category_name)
         dlg.exec_()
+        self.scheduler.run_now("commitments")
 
     def start_flask_thread(self):
         def run():
@@ -740,17 +765,8 @@ class UserDashboard(QMainWindow):
         dlg.exec_()
 
     def add_category_overview(self,layout):
-        categories = fetch_all("""
-            SELECT category_name, color, budget_amount,
-                   COALESCE((
-                       SELECT SUM(amount)
-                       FROM transactions
-                       WHERE category_id = c.category_id
-                         AND transaction_type = 'expense'
-                   ), 0) AS spent
-            FROM categories c
-            WHERE user_id = ?
-        """,(self.user_id,))
+        # this month's (or week's) spend per category, rollover included
+        categories = get_budget_status(self.user_id)
 
         wrapper = QFrame()
         wrapper.setStyleSheet(f"""
@@ -772,7 +788,7 @@ class UserDashboard(QMainWindow):
         for i,cat in enumerate(categories):
             cat_name = cat["category_name"]
             color = cat["color"] or "#4caf50"
-            spent = cat["spent"] or 0
+            spent = cat["spent"]
 
             circle = QPushButton(f"${spent:.0f}")
             circle.setFixedSize(80,80)